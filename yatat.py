@@ -4,194 +4,2568 @@
 #   | | (_| | || (_| | |_
 #   |_|\__,_|\__\__,_|\__| Yet another twitter archive tool
 """See README.md for details"""
+# pylint: disable=too-many-lines
 
+import csv
+import fcntl
+import heapq
 import json
+import mmap
 import os
+import re
+import signal
 import sys
-from datetime import datetime
-from time import sleep
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from importlib import import_module
+from itertools import islice
+from time import perf_counter, sleep, time, time_ns
+from urllib.parse import parse_qs, urlsplit
 
-# Promotion for https://twitter.com/Karlsruher
-from karlsruher import tweepyx
+__version__ = '1.0b1'
+__license__ = "Public Domain"
+__author__ = 'Sascha Schlindwein'
+
+
+class Archive:
+    """The Archive loads and provides tweets from the Twitter archive data."""
+
+    def __init__(self, working_dir, compact=False):
+        """
+        Load tweets from 'tweet.js' and likes from optional 'like.js' in the
+        working directory.
+
+        => Remember to remove the part "window.YTD.tweet.part0 = " from the
+        first line! (and "window.YTD.like.part0 = " from 'like.js')
+
+        :param working_dir: The working directory that contains 'tweet.js' and
+        will be populated with other files
+        :param compact: Optional, keep tweet texts in a compressed TextStore
+        """
+        path_to_archive = self.locate(working_dir)
+        started = perf_counter()
+        self.tweets = []
+        self.tweets_by_id = None
+        self.texts = None
+        self.texts_lock = threading.Lock()
+        self.text_store = TextStore() if compact else None
+        self.entities = {}
+
+        for json_tweet in self.load(path_to_archive, 'tweet'):
+            tweet = Tweet(json_tweet, self.text_store)
+            for tag in tweet.tags:
+                self.entities.setdefault(tag, array('q')).append(len(self.tweets))
+            self.tweets.append(tweet)
+
+        if self.text_store is not None:
+            self.text_store.seal()
+
+        self.likes = self.load_likes(working_dir)
+
+        print('Loaded', len(self.tweets), 'tweets from', path_to_archive,
+              'in {0:.2f}s'.format(perf_counter() - started))
+
+    @staticmethod
+    def load(path, key):
+        """
+        :param path: Path to an archive data file like 'tweet.js'
+        :param key: The key of the items, like "tweet"
+        :return: The items (generator)
+        """
+        with open(path, encoding='utf-8') as archive_data_file:
+            for json_obj in json.load(archive_data_file):
+                yield json_obj[key]
+
+    def load_likes(self, working_dir):
+        """
+        :param working_dir: The working directory
+        :return: The likes from 'like.js', if available
+        """
+        path_to_likes = '{0}/{1}'.format(working_dir, 'like.js')
+        if not os.path.isfile(path_to_likes):
+            return []
+        likes = [Like(json_like) for json_like in self.load(path_to_likes, 'like')]
+        print('Loaded', len(likes), 'likes from', path_to_likes)
+        return likes
+
+    def iterate(self, start=0):
+        """
+        :param start: Optional, the row to start at
+        :return: The tweets from the given row on (iterator)
+        """
+        return islice(self.tweets, start, None)
+
+    def text_index(self):
+        """
+        :return: The TextIndex of all tweets, built on first use, None for
+            compact archives, to keep their texts compressed
+        """
+        if self.text_store is not None:
+            return None
+        with self.texts_lock:
+            if self.texts is None:
+                self.texts = TextIndex(self.iterate())
+        return self.texts
+
+    def tagged(self, tag):
+        """
+        :param tag: A lower case "#hashtag" or "@mention"
+        :return: The sorted rows of tweets with the tag (array)
+        """
+        return self.entities.get(tag, array('q'))
+
+    @staticmethod
+    def locate(working_dir):
+        """
+        :param working_dir: The working directory
+        :return: The path to 'tweet.js' in the working directory
+        """
+        if not os.path.isdir(working_dir):
+            raise Oops('Working Directory "{0}" does not exist.'.format(working_dir))
+
+        path_to_archive = '{0}/{1}'.format(working_dir, 'tweet.js')
+
+        if not os.path.isfile(path_to_archive):
+            raise Oops('File "{0}" does not exist.'.format(path_to_archive))
+
+        return path_to_archive
+
+    def find(self, tweet_id):
+        """
+        :param tweet_id: The ID of the tweet to find
+        :return: The tweet, if available, otherwise None
+        """
+        if self.tweets_by_id is None:
+            self.tweets_by_id = {tweet.tweet_id: tweet for tweet in self.tweets}
+        return self.tweets_by_id.get(str(tweet_id))
+
+    def thread(self, tweet):
+        """
+        :param tweet: The tweet
+        :return: The tweets of the thread in the archive up to the given tweet
+        """
+        thread = [tweet]
+        while thread[0].is_reply():
+            parent = self.find(thread[0].in_reply_to_status_id)
+            if parent is None or parent in thread:
+                break
+            thread.insert(0, parent)
+        return thread
+
+    def index(self):
+        """
+        :return: A sorted string of date based indices, the "%Y-%M" (7 chars)
+            portion of "tweet.timestamp".
+        """
+        index, magic = set(), 7
+        for tweet in self.tweets:
+            index.add(tweet.timestamp[:magic])
+        return ', '.join(sorted(index))
+
+
+class DiskArchive(Archive):  # pylint: disable=too-many-instance-attributes
+    """
+    The DiskArchive keeps tweets in a table on disk for archives larger than
+    the available memory.
+
+    Tweets are read from 'tweet.js' one by one and spilled into sorted runs
+    of at most "budget" MB, the runs are merged into 'yatat.table', sorted
+    by time. Tweets are paged in on demand, the table is reused as long as
+    it's newer than 'tweet.js'. The rows of hashtags and mentions are kept
+    in 'yatat.table.entities', one line per tag.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, working_dir, budget=64):
+        """
+        :param working_dir: The working directory that contains 'tweet.js'
+        :param budget: Memory budget in MB for sorting and paging
+        """
+        path_to_archive = self.locate(working_dir)
+        started = perf_counter()
+        self.path = '{0}/{1}'.format(working_dir, 'yatat.table')
+        self.budget = budget << 20
+        self.text_store = None
+        if not all(
+                os.path.isfile(self.path + suffix)
+                and os.path.getmtime(self.path + suffix) >= os.path.getmtime(path_to_archive)
+                for suffix in ('', '.offsets', '.keys', '.rows', '.entities')):
+            self.build(path_to_archive)
+        self.keys = map_int64(self.path + '.keys')
+        self.rows = map_int64(self.path + '.rows')
+        self.entities = {}
+        with open(self.path + '.entities', encoding='utf-8') as file:
+            for line in file:
+                tag, _, rows = line.rstrip('\n').partition('\t')
+                self.entities[sys.intern(tag)] = array('q', map(int, rows.split(',')))
+        self.tweets = TweetTable(self.path, map_int64(self.path + '.offsets'))
+        self.likes = self.load_likes(working_dir)
+        print('Loaded', len(self.tweets), 'tweets from', path_to_archive,
+              'in {0:.2f}s'.format(perf_counter() - started))
+
+    def build(self, path_to_archive):
+        """
+        Build the table, the ID index and the entity index with external
+        merge sorts, so memory stays within the budget.
+
+        :param path_to_archive: The path to 'tweet.js'
+        """
+        lines = ExternalSort(self.path, self.budget)
+        with open(path_to_archive, encoding='utf-8') as archive_data_file:
+            for json_obj in json_array_items(archive_data_file):
+                json_tweet = {
+                    key: value for key, value in json_obj['tweet'].items()
+                    if key in Tweet.fields
+                }
+                json_tweet['flags'], json_tweet['tags'] = Tweet.entities(json_obj['tweet'])
+                lines.add('{0}\t{1}\n'.format(
+                    Tweet(json_tweet).timestamp, json.dumps(json_tweet, ensure_ascii=False)
+                ))
+        self.write_table(lines)
+
+    def write_table(self, lines):
+        """
+        Write the table from its sorted lines, then the ID and entity indexes.
+
+        :param lines: Sorted table lines (ExternalSort)
+        """
+        ids = ExternalSort(self.path + '.ids', self.budget // 2)
+        tags = ExternalSort(self.path + '.tags', self.budget // 2)
+        with open(self.path + '.tmp', 'wb') as table, \
+                Int64Writer(self.path + '.offsets') as offsets:
+            for row, line in enumerate(lines):
+                json_tweet = json.loads(line.partition('\t')[2])
+                ids.add('{0:020d}\t{1}\n'.format(int(json_tweet['id']), row))
+                for tag in Tweet.entities(json_tweet)[1]:
+                    tags.add('{0}\t{1:020d}\n'.format(tag, row))
+                offsets.append(table.tell())
+                table.write(line.encode('utf-8'))
+        self.write_index(ids)
+        self.write_entities(tags)
+        os.replace(self.path + '.tmp', self.path)
+
+    def write_index(self, ids):
+        """
+        :param ids: Sorted lines of tweet ID and row (ExternalSort)
+        """
+        with Int64Writer(self.path + '.keys') as keys, \
+                Int64Writer(self.path + '.rows') as rows:
+            for line in ids:
+                key, _, row = line.partition('\t')
+                keys.append(int(key))
+                rows.append(int(row))
+
+    def write_entities(self, tags):
+        """
+        :param tags: Sorted lines of tag and row (ExternalSort)
+        """
+        with open(self.path + '.entities', 'w', encoding='utf-8') as file:
+            current = None
+            for line in tags:
+                tag, _, row = line.rstrip('\n').partition('\t')
+                if tag == current:
+                    file.write(',{0}'.format(int(row)))
+                else:
+                    file.write('{0}{1}\t{2}'.format('' if current is None else '\n', tag, int(row)))
+                    current = tag
+            if current is not None:
+                file.write('\n')
+
+    def iterate(self, start=0):
+        """
+        :param start: Optional, the row to start at
+        :return: The tweets from the given row on (generator)
+        """
+        return self.tweets.iterate(start)
+
+    def text_index(self):
+        """:return: None, texts stay on disk"""
+        return None
+
+    def find(self, tweet_id):
+        """
+        :param tweet_id: The ID of the tweet to find
+        :return: The tweet, if available, otherwise None
+        """
+        try:
+            key = int(tweet_id)
+        except (TypeError, ValueError):
+            return None
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.tweets[self.rows[index]]
+        return None
+
+
+class ExternalSort:
+    """
+    Sorts more lines than fit into memory: lines are collected up to the
+    budget, spilled into sorted run files and merged, at most "fan_in" runs
+    at a time. Run files are removed once the lines are read.
+    """
+
+    # Maximal number of run files open at once:
+    fan_in = 64
+
+    def __init__(self, path, budget):
+        """
+        :param path: Prefix of the run files
+        :param budget: Memory budget in bytes for lines to sort
+        """
+        self.path = path
+        self.budget = budget
+        self.runs, self.lines, self.size, self.count = [], [], 0, 0
+
+    def add(self, line):
+        """:param line: The line to sort, ending with a newline"""
+        self.lines.append(line)
+        self.size += sys.getsizeof(line) + 8
+        if self.size >= self.budget:
+            self.spill()
+
+    def run(self):
+        """:return: The path of a new run file"""
+        self.count += 1
+        return '{0}.run{1}'.format(self.path, self.count)
+
+    def spill(self):
+        """Write the collected lines to a sorted run file."""
+        self.lines.sort()
+        run = self.run()
+        self.runs.append(run)
+        with open(run, 'w', encoding='utf-8') as file:
+            file.writelines(self.lines)
+        self.lines, self.size = [], 0
+
+    def merge(self, runs):
+        """
+        :param runs: Run files to merge and remove
+        :return: The path of the merged run file
+        """
+        run = self.run()
+        with ExitStack() as stack, open(run, 'w', encoding='utf-8') as merged:
+            merged.writelines(heapq.merge(*(
+                stack.enter_context(open(path, encoding='utf-8')) for path in runs
+            )))
+        for path in runs:
+            os.remove(path)
+        return run
+
+    def __iter__(self):
+        """:return: All lines, sorted (generator)"""
+        try:
+            if self.lines:
+                self.spill()
+            while len(self.runs) > self.fan_in:
+                merged = self.merge(self.runs[:self.fan_in])
+                self.runs = self.runs[self.fan_in:] + [merged]
+            with ExitStack() as stack:
+                yield from heapq.merge(*(
+                    stack.enter_context(open(path, encoding='utf-8')) for path in self.runs
+                ))
+        finally:
+            for path in self.runs:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.runs = []
+
+
+class Int64Writer:
+    """Writes int64 values to a binary file in blocks, use as context manager."""
+
+    def __init__(self, path, block_size=1 << 16):
+        """
+        :param path: The binary file to write
+        :param block_size: Number of values to buffer
+        """
+        self.path = path
+        self.block_size = block_size
+        self.block = array('q')
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'wb')  # pylint: disable=consider-using-with
+        return self
+
+    def append(self, number):
+        """:param number: The value to write"""
+        self.block.append(number)
+        if len(self.block) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered values."""
+        self.block.tofile(self.file)
+        self.block = array('q')
+
+    def __exit__(self, *exc_info):
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+
+
+class TweetTable:
+    """
+    Read-only sequence of tweets in a table file, paged in on demand with a
+    small LRU cache of pages. Iteration streams the file.
+    """
+
+    def __init__(self, path, offsets, page_size=256, cache_size=16):
+        """
+        :param path: The table file
+        :param offsets: Byte offset of each row in the table file
+        :param page_size: Number of rows per page
+        :param cache_size: Number of pages to keep
+        """
+        self.path = path
+        self.offsets = offsets
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def tweet(line):
+        """:return: The tweet from a table line"""
+        return Tweet(json.loads(line.partition(b'\t')[2]))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        return self.iterate()
+
+    def iterate(self, start=0):
+        """
+        :param start: Optional, the row to start at
+        :return: The tweets from the given row on, streamed (generator)
+        """
+        if start >= len(self):
+            return
+        with open(self.path, 'rb') as file:
+            file.seek(self.offsets[start])
+            for line in file:
+                yield self.tweet(line)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Table index out of range')
+        page, row = divmod(index, self.page_size)
+        with self.lock:
+            if page in self.cache:
+                self.cache.move_to_end(page)
+                return self.cache[page][row]
+        with open(self.path, 'rb') as file:
+            file.seek(self.offsets[page * self.page_size])
+            tweets = [self.tweet(line) for line in islice(file, self.page_size)]
+        with self.lock:
+            self.cache[page] = tweets
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tweets[row]
+
+
+class Like:  # pylint: disable=too-few-public-methods
+    """Liked tweets, not necessarily our own."""
+
+    __slots__ = ('tweet_id', 'text')
+
+    def __init__(self, json_like):
+        """
+        :param json_like: The like portion as extracted from 'like.js'
+        """
+        self.tweet_id = json_like['tweetId']
+        self.text = json_like.get('fullText', '')
+
+    def __repr__(self):
+        """String representation: 'like <tweet_id> <text>'"""
+        return 'like {0} {1}'.format(self.tweet_id, self.text)
+
+
+class TextStore:  # pylint: disable=too-many-instance-attributes
+    """
+    Compact storage for tweet texts.
+
+    Equal texts (think of retweets and automated posts) are stored once,
+    texts are kept in zlib compressed blocks of "block_size" texts and a
+    small LRU cache holds the most recently decompressed blocks.
+
+    The slot of each tweet's text is kept in an array next to the tweet
+    IDs, so tweets only point to the store. While loading, equal texts are
+    found by hash in an open addressing table of two arrays.
+    """
+
+    def __init__(self, block_size=256, cache_size=8):
+        """
+        :param block_size: Number of texts per compressed block
+        :param cache_size: Number of decompressed blocks to keep
+        """
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.blocks = []
+        self.pending = []
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.ids, self.slots = array('q'), array('I')
+        self.hashes, self.table = array('q', bytes(8 << 10)), array('I', bytes(4 << 10))
+        self.count = 0
+
+    def __len__(self):
+        """:return: The number of distinct texts"""
+        return self.count
+
+    def add(self, tweet_id, text):
+        """
+        :param tweet_id: The ID of the tweet
+        :param text: The text of the tweet
+        :return: The slot of the text, pass it to "get()"
+        """
+        slot = self.find(text) if self.table is not None else None
+        if slot is None:
+            slot = self.count
+            self.pending.append(text)
+            if len(self.pending) == self.block_size:
+                self.blocks.append(zlib.compress(
+                    json.dumps(self.pending, ensure_ascii=False).encode('utf-8')
+                ))
+                self.pending = []
+            self.count += 1
+        self.ids.append(int(tweet_id))
+        self.slots.append(slot)
+        return slot
+
+    def find(self, text):
+        """
+        :param text: The text to look up
+        :return: The slot of an equal text added before, None if there's none
+            (then the next slot is taken for the text)
+        """
+        key, mask = hash(text), len(self.table) - 1
+        index = key & mask
+        while self.table[index]:
+            if self.hashes[index] == key:
+                return self.table[index] - 1
+            index = (index + 1) & mask
+        self.hashes[index], self.table[index] = key, self.count + 1
+        if (self.count + 1) * 2 > len(self.table):
+            self.grow()
+        return None
+
+    def grow(self):
+        """Double the lookup table."""
+        hashes, table = self.hashes, self.table
+        self.hashes = array('q', bytes(16 * len(hashes)))
+        self.table = array('I', bytes(8 * len(table)))
+        mask = len(self.table) - 1
+        for key, slot in zip(hashes, table):
+            if slot:
+                index = key & mask
+                while self.table[index]:
+                    index = (index + 1) & mask
+                self.hashes[index], self.table[index] = key, slot
+
+    def seal(self):
+        """Stop deduplication, release its lookup table and sort slots by tweet ID."""
+        self.hashes = self.table = None
+        if any(self.ids[index] > self.ids[index + 1] for index in range(len(self.ids) - 1)):
+            order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+            self.ids = array('q', (self.ids[index] for index in order))
+            self.slots = array('I', (self.slots[index] for index in order))
+
+    def text(self, tweet_id):
+        """
+        :param tweet_id: The ID of a tweet added before
+        :return: The text of the tweet
+        """
+        number = int(tweet_id)
+        index = bisect_left(self.ids, number)
+        if index == len(self.ids) or self.ids[index] != number:
+            raise KeyError(tweet_id)
+        return self.get(self.slots[index])
+
+    def get(self, slot):
+        """
+        :param slot: The slot as returned by "add()"
+        :return: The text
+        """
+        block, offset = divmod(slot, self.block_size)
+        if block == len(self.blocks):
+            return self.pending[offset]
+        with self.lock:
+            if block in self.cache:
+                self.cache.move_to_end(block)
+                return self.cache[block][offset]
+        texts = json.loads(zlib.decompress(self.blocks[block]))
+        with self.lock:
+            self.cache[block] = texts
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return texts[offset]
+
+
+class Tweet:  # pylint: disable=too-many-instance-attributes
+    """It's all about tweets!"""
+
+    # The keys used from 'tweet.js', besides the entities:
+    fields = (
+        'id', 'full_text', 'created_at', 'in_reply_to_status_id', 'in_reply_to_screen_name'
+    )
+
+    # Bits of "flags", set if the tweet has entities of the kind:
+    entity_flags = {'media': 1, 'link': 2, 'mention': 4, 'hashtag': 8}
+
+    __slots__ = (
+        'tweet_id', 'timestamp', 'in_reply_to_status_id', 'in_reply_to_screen_name',
+        'text_source', 'flags', 'tags'
+    )
+
+    def __init__(self, json_tweet, text_store=None):
+        """
+        :param json_tweet: The tweet portion as extracted from 'tweet.js'
+        :param text_store: Optional, the TextStore to keep the text in
+        """
+        self.tweet_id = json_tweet["id"]
+        # The text, or the TextStore that keeps it:
+        self.text_source = json_tweet["full_text"]
+        if text_store is not None:
+            text_store.add(self.tweet_id, self.text_source)
+            self.text_source = text_store
+        self.timestamp = datetime.strftime(datetime.strptime(
+                json_tweet["created_at"], '%a %b %d %H:%M:%S +0000 %Y'
+            ), '%Y-%m-%d %H:%M:%S' )
+        self.in_reply_to_status_id = \
+            json_tweet["in_reply_to_status_id"] \
+                if "in_reply_to_status_id" in json_tweet else None
+        self.in_reply_to_screen_name = json_tweet.get("in_reply_to_screen_name")
+        self.flags, self.tags = self.entities(json_tweet)
+
+    @classmethod
+    def entities(cls, json_tweet):
+        """
+        :param json_tweet: The tweet portion as extracted from 'tweet.js', or
+            as stored in 'yatat.table' with "flags" and "tags" instead of entities
+        :return: Tupel of entity flags and tags, the lower case "#hashtags"
+            and "@mentions" (int flags, tuple tags)
+        """
+        if 'flags' in json_tweet:
+            return json_tweet['flags'], tuple(sys.intern(tag) for tag in json_tweet['tags'])
+        entities = json_tweet.get('entities') or {}
+        flags = 0
+        if entities.get('media') or (json_tweet.get('extended_entities') or {}).get('media'):
+            flags |= cls.entity_flags['media']
+        if entities.get('urls'):
+            flags |= cls.entity_flags['link']
+        if entities.get('user_mentions'):
+            flags |= cls.entity_flags['mention']
+        if entities.get('hashtags'):
+            flags |= cls.entity_flags['hashtag']
+        if not flags & (cls.entity_flags['mention'] | cls.entity_flags['hashtag']):
+            return flags, ()
+        return flags, tuple(
+            [sys.intern('#' + hashtag['text'].lower())
+             for hashtag in entities.get('hashtags', ())]
+            + [sys.intern('@' + mention['screen_name'].lower())
+               for mention in entities.get('user_mentions', ())]
+        )
+
+    @property
+    def text(self):
+        """The full text of the tweet"""
+        if isinstance(self.text_source, TextStore):
+            return self.text_source.text(self.tweet_id)
+        return self.text_source
+
+    def __repr__(self):
+        """String representation: 'YYYY-MM-DD <tweet_id> <text>'"""
+        return '{0} {1} {2}'.format(self.timestamp[:10], self.tweet_id, self.text)
+
+    def is_reply(self):
+        """Tweets with an "in_reply_to_status_id" set are replies."""
+        return self.in_reply_to_status_id is not None
+
+    def is_retweet(self):
+        """Tweets text starting with "RT @" are interpreted as retweets."""
+        return self.text.startswith("RT @")
+
+    def is_tweet(self):
+        """Tweets that are not retweets and not replies are tweets. ;)"""
+        return not self.is_retweet() and not self.is_reply()
+
+
+class IdSet:
+    """
+    Compact set of integer IDs (tweet IDs are 64-bit integers).
+
+    The IDs live in a sorted int64 array, which might be memory-mapped
+    from a file, plus small sets of added and removed IDs until the next
+    "save()". Subjects are accepted as int or str and iterated as str.
+    """
+
+    def __init__(self, base=None):
+        """
+        :param base: Optional, sorted int64 sequence (array or memoryview)
+        """
+        self.base = base if base is not None else array('q')
+        self.added, self.removed = set(), set()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, filename):
+        """
+        :param filename: Binary file of native int64 values, sorted
+        :return: The IdSet, memory-mapped from the file
+        """
+        return cls(map_int64(filename))
+
+    def save(self, filename):
+        """
+        :param filename: Binary file to (atomically) write the sorted IDs to
+        """
+        ids = self.compact()
+        with open(filename + '.tmp', 'wb') as file:
+            ids.tofile(file)
+        os.replace(filename + '.tmp', filename)
+        self.dirty = False
+
+    def compact(self):
+        """Merge added and removed IDs into the sorted base array."""
+        if self.added or self.removed or not isinstance(self.base, array):
+            self.base = array('q', heapq.merge(
+                (number for number in self.base if number not in self.removed),
+                sorted(self.added)
+            ))
+            self.added, self.removed = set(), set()
+        return self.base
+
+    def in_base(self, number):
+        """:return: True if the number is in the sorted base array"""
+        index = bisect_left(self.base, number)
+        return index < len(self.base) and self.base[index] == number
+
+    def __contains__(self, subject):
+        try:
+            number = int(subject)
+        except (TypeError, ValueError):
+            return False
+        if number in self.added:
+            return True
+        return number not in self.removed and self.in_base(number)
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.added)
+
+    def __iter__(self):
+        removed = set(self.removed)
+        for number in heapq.merge(self.base, sorted(self.added)):
+            if number not in removed:
+                yield str(number)
+
+    def add(self, subject):
+        """:param subject: The ID to add, int or str"""
+        number = int(subject)
+        if number in self.removed:
+            self.removed.remove(number)
+        elif not self.in_base(number):
+            self.added.add(number)
+        self.dirty = True
+
+    def update(self, subjects):
+        """:param subjects: The IDs to add (iterable)"""
+        for subject in subjects:
+            self.add(subject)
+
+    def discard(self, subject):
+        """:param subject: The ID to remove, if present"""
+        if subject not in self:
+            return
+        number = int(subject)
+        if number in self.added:
+            self.added.remove(number)
+        else:
+            self.removed.add(number)
+        self.dirty = True
+
+
+class Decisions:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    """
+    Make persistent decisions about subjects!
+
+    The related use-case is that we want to store meta information about
+    tweets that we already browsed in the archive. We want to remember
+    tweets that we'd like to keep or to destroy (later).
+
+    The "subject" is a tweet_id and the related "decision" might be
+    either "keep" or "destroy" or anything else. A subject has one decision
+    at most, the last one made.
+
+    Decisions are mapped lazy to files, so *please use valid file names*
+    as possible decision keys. Subjects are stored in binary "<decision>.ids"
+    files, plain text "<decision>" files (one subject per line) are imported
+    once, while there's no binary file yet, and exported on demand.
+
+    Concurrent sessions on one working directory append their decisions to
+    their own "yatat.session.<name>.log" file (or another "log_prefix").
+    All logs are merged on read: per subject, the last decision wins, no
+    matter which session made it.
+    On "commit()", the log offsets folded into the binary files are stored
+    in "yatat.session.offsets", later loads only replay what follows, with
+    or without a session of their own. Loading and committing hold the lock
+    file "yatat.session.lock", so binary files and offsets stay in step.
+
+    Every change bumps the "generation" and is journaled, so results
+    computed from decisions can be brought up to date, see SelectionCache.
+    """
+
+    log_prefix, log_suffix, offsets_suffix, lock_suffix = \
+        'yatat.session.', '.log', 'offsets', 'lock'
+
+    # Number of recent changes to journal:
+    journal_size = 1 << 16
+
+    def __init__(self, work_dir, possible_decisions, text=False, session=None,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 reviewed=None, log_prefix=None):
+        """
+        :param work_dir: The working directory for decision files
+        :param possible_decisions: All possible decisions
+        :param text: Optional, also export plain text files on "commit()"
+        :param session: Optional, name of this session to log decisions
+        :param reviewed: Optional, the decisions sessions may conflict
+            about, defaults to all possible decisions
+        :param log_prefix: Optional, prefix of the session logs, to keep
+            logs of independent Decisions apart
+        """
+        if session is not None and (not session or '/' in str(session)):
+            raise Oops('Invalid session name "{0}".'.format(session))
+        self.log_prefix = log_prefix or self.log_prefix
+        self.work_dir = work_dir
+        self.possible_decisions = possible_decisions
+        self.reviewed = set(possible_decisions if reviewed is None else reviewed)
+        self.text = text
+        self.session = session
+        self.decisions = {}
+        self.stamps, self.deciders, self.offsets = {}, {}, {}
+        self.sequence = 0
+        self.generation = 0
+        self.journal = deque(maxlen=self.journal_size)
+        with self.locked():
+            for decision, _, filename in self.possible():
+                if os.path.isfile(filename):
+                    subjects = IdSet.load(filename)
+                else:
+                    subjects = self.import_text(decision)
+                    subjects.save(filename)
+                self.decisions[decision] = subjects
+            if os.path.isfile(self.offsets_file()):
+                with open(self.offsets_file(), encoding='utf-8') as file:
+                    self.offsets = {
+                        filename: tuple(position)
+                        for filename, position in json.load(file).items()
+                    }
+        self.merge()
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the lock file of the working directory, so binary files and
+        log offsets are read and written together by one process at a time.
+        """
+        with open('/'.join([self.work_dir, self.log_prefix + self.lock_suffix]), 'a',
+                  encoding='utf-8') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def offsets_file(self):
+        """:return: The name of the file of log offsets folded into binary files"""
+        return '/'.join([self.work_dir, self.log_prefix + self.offsets_suffix])
+
+    def log_file(self, session):
+        """
+        :param session: The session name
+        :return: The name of the log file of the session
+        """
+        return '/'.join([self.work_dir, self.log_prefix + session + self.log_suffix])
+
+    def merge(self):
+        """Replay new decisions from the logs of all sessions."""
+        for filename in sorted(os.listdir(self.work_dir)):
+            if not filename.startswith(self.log_prefix) \
+                    or not filename.endswith(self.log_suffix):
+                continue
+            session = filename[len(self.log_prefix):-len(self.log_suffix)]
+            path = '/'.join([self.work_dir, filename])
+            offset, number = self.offsets.get(filename, (0, 0))
+            if offset > os.path.getsize(path):
+                offset, number = 0, 0  # Log was started over
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break  # Still being written
+                    offset, number = offset + len(line), number + 1
+                    stamp, operation, decision, subject = \
+                        line.decode('utf-8').rstrip('\n').split('\t')
+                    self.replay((int(stamp), session, number), operation, decision, subject)
+            self.offsets[filename] = offset, number
+
+    def replay(self, stamp, operation, decision, subject):
+        """
+        Apply a logged decision, unless a later one was applied to the subject.
+
+        :param stamp: Tupel of (int time, str session, int sequence)
+        :param operation: "decide" or "revoke"
+        :param decision: The decision
+        :param subject: The subject
+        """
+        if decision not in self.decisions:
+            return
+        if operation == 'decide' and decision in self.reviewed:
+            self.deciders.setdefault(subject, {})[stamp[1]] = decision
+        if stamp <= self.stamps.get(subject, stamp[:0]):
+            return
+        self.stamps[subject] = stamp
+        self.apply(operation, decision, subject)
+
+    def apply(self, operation, decision, subject):
+        """
+        Apply a decision, a subject has only its last decision.
+
+        :param operation: "decide" or "revoke"
+        :param decision: The decision
+        :param subject: The subject
+        """
+        if operation == 'decide':
+            for subjects in self.decisions.values():
+                subjects.discard(subject)
+            self.decisions[decision].add(subject)
+        else:
+            self.decisions[decision].discard(subject)
+        self.changed([subject])
+
+    def log(self, operation, subjects, decision):
+        """
+        Append decisions to the log of this session and apply them.
+
+        :param operation: "decide" or "revoke"
+        :param subjects: The subjects (iterable)
+        :param decision: The decision
+        """
+        lines = []
+        for subject in subjects:
+            self.sequence += 1
+            stamp = (time_ns(), self.session, self.sequence)
+            self.replay(stamp, operation, decision, str(subject))
+            lines.append('{0}\t{1}\t{2}\t{3}\n'.format(stamp[0], operation, decision, subject))
+        with open(self.log_file(self.session), 'a', encoding='utf-8') as file:
+            file.writelines(lines)
+
+    def changed(self, subjects):
+        """
+        :param subjects: The subjects whose decisions changed (iterable)
+        """
+        for subject in subjects:
+            self.generation += 1
+            self.journal.append(str(subject))
+
+    def changes(self, generation):
+        """
+        :param generation: A former generation
+        :return: The subjects changed since then (list), None if the journal
+            doesn't reach back that far
+        """
+        missing = self.generation - generation
+        if missing > len(self.journal):
+            return None
+        return list(islice(self.journal, len(self.journal) - missing, None))
+
+    def conflicts(self):
+        """
+        :return: Subjects that sessions decided differently about
+            (dict subject -> dict session -> decision)
+        """
+        return {
+            subject: sessions for subject, sessions in self.deciders.items()
+            if len(set(sessions.values())) > 1
+        }
+
+    def commit(self):
+        """Write changed subjects and decisions to files."""
+        with self.locked():
+            self.merge()
+            for decision, subjects, filename in self.possible():
+                if self.text:
+                    self.export_text(decision)
+                if subjects.dirty:
+                    subjects.save(filename)
+            if self.offsets:
+                with open(self.offsets_file() + '.tmp', 'w', encoding='utf-8') as file:
+                    json.dump(self.offsets, file)
+                os.replace(self.offsets_file() + '.tmp', self.offsets_file())
+
+    def text_file(self, decision):
+        """
+        :param decision: The decision
+        :return: The name of the plain text file of the decision
+        """
+        return '/'.join([self.work_dir, decision])
+
+    def import_text(self, decision):
+        """
+        Invalid lines are skipped and reported.
+
+        :param decision: The decision
+        :return: The subjects in the plain text file of the decision, if any (IdSet)
+        """
+        subjects, invalid = IdSet(), 0
+        if os.path.isfile(self.text_file(decision)):
+            with open(self.text_file(decision), encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        if line.strip():
+                            subjects.add(line.strip())
+                    except ValueError:
+                        invalid += 1
+        if invalid:
+            print('Skipped', invalid, 'invalid lines in', self.text_file(decision))
+        return subjects
+
+    def export_text(self, decision, filename=None):
+        """
+        :param decision: The decision
+        :param filename: Optional, defaults to the plain text file of the decision
+        """
+        with open(filename or self.text_file(decision), 'w', encoding='utf-8') as file:
+            file.writelines('{0}\n'.format(subject) for subject in self.decisions[decision])
+
+    def possible(self):
+        """:return: All possible decisions (generator)"""
+        for decision in self.possible_decisions:
+            yield self.decision(decision)
+
+    def decision(self, decision):
+        """
+        :param decision: The decision
+        :return: Tupel of the given decision, its subjects and related
+            filename (str decision, IdSet subjects, str filename)
+        """
+        return (
+            decision,
+            self.decisions[decision] if decision in self.decisions else None,
+            '/'.join([self.work_dir, decision + '.ids'])
+        )
+
+    def decide(self, subject, decision):
+        """
+        :param subject: The subject to decide about
+        :param decision: The decision
+        """
+        if self.session is not None:
+            self.log('decide', [subject], decision)
+        else:
+            self.apply('decide', decision, subject)
+
+    def decide_all(self, subjects, decision):
+        """
+        :param subjects: The subjects to decide about (iterable)
+        :param decision: The decision
+        """
+        if self.session is not None:
+            self.log('decide', subjects, decision)
+        else:
+            for subject in subjects:
+                self.apply('decide', decision, subject)
+
+    def revoke(self, subject, decision):
+        """
+        :param subject: The subject to revoke the decision from
+        :param decision: The decision to revoke
+        """
+        if self.session is not None:
+            if subject in self.decisions[decision]:
+                self.log('revoke', [subject], decision)
+        elif subject in self.decisions[decision]:
+            self.apply('revoke', decision, subject)
+
+    def count(self, decision):
+        """
+        :param decision:
+        :return: The number of subjects for the given decision
+        """
+        subjects = self.decision(decision)[1]
+        return len(subjects)
+
+    def made(self, subject, explicit_decision=None):
+        """
+        :param subject: The subject to check
+        :param explicit_decision: Optional, an explicit decision
+        :return: True if decision was made on subject, otherwise False
+        """
+        for decision, subjects, _ in self.possible():
+            if explicit_decision:
+                if decision == explicit_decision and str(subject) in subjects:
+                    return True
+            else:
+                if str(subject) in subjects:
+                    return True
+        return False
+
+
+class Statistics:  # pylint: disable=too-few-public-methods
+    """
+    Statistics about tweets, computed in a single pass: tweets, retweets,
+    replies and decided tweets per month plus top reply targets, retweeted
+    accounts and hashtags.
+    """
+
+    retweeted_pattern = re.compile(r'^RT @(\w+)')
+
+    def __init__(self, tweets, decisions, top=5):
+        """
+        :param tweets: The tweets to analyse (iterable)
+        :param decisions: The Decisions, to count decided tweets
+        :param top: Length of the top lists
+        """
+        self.top = top
+        self.months = {}
+        self.reply_targets, self.retweeted, self.hashtags = Counter(), Counter(), Counter()
+        for tweet in tweets:
+            month = self.months.setdefault(tweet.timestamp[:7], Counter())
+            text = tweet.text
+            retweeted = self.retweeted_pattern.match(text)
+            if retweeted:
+                month['retweets'] += 1
+                self.retweeted[retweeted.group(1)] += 1
+            elif tweet.is_reply():
+                month['replies'] += 1
+                if tweet.in_reply_to_screen_name:
+                    self.reply_targets[tweet.in_reply_to_screen_name] += 1
+            else:
+                month['tweets'] += 1
+            if decisions.made(tweet.tweet_id):
+                month['decided'] += 1
+            self.hashtags.update(tag[1:] for tag in tweet.tags if tag.startswith('#'))
+
+    def __repr__(self):
+        lines = [' month      tweets retweets  replies  decided']
+        for month in sorted(self.months):
+            counts = self.months[month]
+            total = counts['tweets'] + counts['retweets'] + counts['replies']
+            lines.append(' {0:<8} {1:>8} {2:>8} {3:>8} {4:>7.0%}'.format(
+                month, counts['tweets'], counts['retweets'], counts['replies'],
+                counts['decided'] / total
+            ))
+        for title, counter, prefix in (
+                ('Top replied to', self.reply_targets, '@'),
+                ('Top retweeted', self.retweeted, '@'),
+                ('Top hashtags', self.hashtags, '#')):
+            lines.append('\n{0}:'.format(title))
+            lines.extend(
+                ' {0:>8} {1}{2}'.format(count, prefix, name)
+                for name, count in counter.most_common(self.top)
+            )
+        return '\n'.join(lines)
+
+
+class Clusters:
+    """
+    Groups near-duplicate tweets (think of cross-posts, check-ins and
+    templated replies) in roughly linear time: MinHash signatures of text
+    shingles are bucketed band by band (locality sensitive hashing), tweets
+    sharing a bucket and a similar signature end up in the same cluster.
+
+    Signatures use one permutation hashing: the shingle hashes are spread
+    over "bands * rows" bins, each bin keeps its minimum and empty bins
+    borrow from their next neighbour. That's one hash per shingle instead
+    of one per shingle and signature value.
+    """
+
+    url_pattern = re.compile(r'https?://\S+')
+
+    def __init__(self, tweets, bands=8, rows=4, threshold=0.5, shingle_size=5):
+        """
+        :param tweets: The tweets to cluster (iterable)
+        :param bands: Number of LSH bands
+        :param rows: Number of signature values per band
+        :param threshold: Minimal estimated similarity to join a cluster
+        :param shingle_size: Length of the character shingles
+        """
+        self.shingle_size = shingle_size
+        self.size = bands * rows
+        self.tweets = list(tweets)
+        self.parents = list(range(len(self.tweets)))
+        signatures, buckets = [], {}
+        for index, tweet in enumerate(self.tweets):
+            signature = self.signature(tweet.text)
+            signatures.append(signature)
+            for band in range(bands):
+                key = (band, signature[band * rows:(band + 1) * rows])
+                other = buckets.setdefault(key, index)
+                if other != index and self.similarity(
+                        signature, signatures[other]) >= threshold:
+                    self.union(index, other)
+        groups = {}
+        for index, tweet in enumerate(self.tweets):
+            groups.setdefault(self.root(index), []).append(tweet)
+        self.clusters = sorted(
+            (group for group in groups.values() if len(group) > 1),
+            key=len, reverse=True
+        )
+
+    def shingles(self, text):
+        """
+        :param text: The text
+        :return: Hashes of the character shingles of the normalised text
+        """
+        text = ' '.join(self.url_pattern.sub('', text).lower().split())
+        size = self.shingle_size
+        return {
+            zlib.crc32(text[start:start + size].encode('utf-8'))
+            for start in range(max(1, len(text) - size + 1))
+        }
+
+    def signature(self, text):
+        """
+        :param text: The text
+        :return: The MinHash signature of the text (tuple)
+        """
+        size = self.size
+        bins = [None] * size
+        for shingle in self.shingles(text):
+            index, value = shingle % size, shingle // size
+            if bins[index] is None or value < bins[index]:
+                bins[index] = value
+        signature = []
+        for index in range(size):
+            distance = 0
+            while bins[(index + distance) % size] is None:
+                distance += 1
+            signature.append(bins[(index + distance) % size] + (distance << 32))
+        return tuple(signature)
+
+    @staticmethod
+    def similarity(signature, other):
+        """:return: The estimated (Jaccard) similarity of two signatures"""
+        return sum(1 for mine, theirs in zip(signature, other) if mine == theirs) \
+            / len(signature)
+
+    def root(self, index):
+        """:return: The cluster root of the tweet at index (union find)"""
+        while self.parents[index] != index:
+            self.parents[index] = self.parents[self.parents[index]]
+            index = self.parents[index]
+        return index
+
+    def union(self, index, other):
+        """Join the clusters of the tweets at both indices."""
+        self.parents[self.root(index)] = self.root(other)
+
+
+class TextIndex:
+    """
+    All tweet texts, casefolded, in one contiguous buffer with an offsets
+    array that maps positions back to archive rows. Large buffers are
+    searched in chunks by a pool of processes, started on first use (or
+    up front, see "start()"), each worker receives the buffer once.
+    """
+
+    # Texts are terminated by:
+    separator = '\x00'
+
+    # Minimal buffer length to search in parallel:
+    parallel_threshold = 1 << 24
+
+    # Buffer and offsets within pool workers, see "share()":
+    shared = None
+
+    def __init__(self, tweets):
+        """
+        :param tweets: The tweets of the archive (iterable)
+        """
+        texts, offsets, offset = [], array('q', [0]), 0
+        for tweet in tweets:
+            text = tweet.text.casefold() + self.separator
+            texts.append(text)
+            offset += len(text)
+            offsets.append(offset)
+        self.buffer = ''.join(texts)
+        self.offsets = offsets
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def start(self, processes=None):
+        """
+        Start the pool of processes, if the buffer is large enough to be
+        searched in parallel. Call it before starting threads, workers are
+        forked from this process.
+
+        :param processes: Optional, number of processes, defaults to the
+            number of CPUs
+        :return: The pool, None to search in this process
+        """
+        processes = processes or os.cpu_count() or 1
+        if processes < 2 or len(self.buffer) < self.parallel_threshold \
+                or len(self.offsets) - 1 < processes:
+            return None
+        with self.lock:
+            if self.pool is None:
+                # pylint: disable=import-outside-toplevel
+                from concurrent.futures import ProcessPoolExecutor, wait
+                self.pool = ProcessPoolExecutor(
+                    processes, initializer=TextIndex.share, initargs=(self.buffer, self.offsets)
+                )
+                wait([self.pool.submit(int) for _ in range(processes)])
+            return self.pool
+
+    def search(self, pattern, flags=re.IGNORECASE, processes=None):
+        """
+        :param pattern: The regular expression, to match casefolded texts
+        :param flags: The regular expression flags
+        :param processes: Optional, number of processes for large buffers,
+            defaults to the number of CPUs
+        :return: The sorted rows of matching tweets (list)
+        """
+        processes = processes or os.cpu_count() or 1
+        rows = len(self.offsets) - 1
+        pool = self.start(processes)
+        if pool is None:
+            return search_text(pattern, flags, self.buffer, self.offsets)
+        bounds = [rows * number // processes for number in range(processes + 1)]
+        futures = [
+            pool.submit(TextIndex.search_shared, pattern, flags, first, last)
+            for first, last in zip(bounds, bounds[1:])
+        ]
+        return [row for future in futures for row in future.result()]
+
+    def close(self):
+        """Shut down the pool of processes, if started."""
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    @staticmethod
+    def share(buffer, offsets):
+        """Keep buffer and offsets in a pool worker, called once per worker."""
+        TextIndex.shared = buffer, offsets
+
+    @staticmethod
+    def search_shared(pattern, flags, first, last):
+        """:return: The matching rows from first to last in a pool worker"""
+        buffer, offsets = TextIndex.shared  # pylint: disable=unpacking-non-sequence
+        return search_text(pattern, flags, buffer, offsets, first, last)
+
+
+class Selection:  # pylint: disable=too-many-instance-attributes
+    """
+    Criteria to select tweets from the archive, the same criteria that are
+    offered interactively by the UserInterface.
+    """
+
+    # Possible exclusions, each one filters out matching tweets:
+    exclusions = ('read', 'retweets', 'replies', 'tweets')
+
+    # Regular expression searches: /pattern/flags
+    regex_search = re.compile(r'^/(.*)/([cw]*)$', re.DOTALL)
+
+    # Entity search terms: has:media, #hashtag, @mention
+    entity_term = re.compile(r'^(?:has:(\w+)|([#@]\w+))$')
+
+    def __init__(self, search=None, span=None, exclude=(), has=()):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        :param search: Optional, text to search for (case insensitive) or
+            "/pattern/flags" to search for a regular expression, flag "c"
+            for case sensitive and flag "w" to match whole words only.
+            Plain text may contain the terms "has:<entity>", "#hashtag"
+            and "@mention" to select by entities.
+        :param span: Optional, timestamp prefix like "2020" or "2020-09"
+        :param exclude: Optional, names of exclusions to apply
+        :param has: Optional, names of entities the tweets must have, see
+            Tweet.entity_flags
+        """
+        for exclusion in exclude:
+            if exclusion not in self.exclusions:
+                raise Oops('Unknown exclusion "{0}".'.format(exclusion))
+        self.search = search
+        self.span = span
+        self.exclude = tuple(exclude)
+        self.has = tuple(has)
+        self.tags = ()
+        self.matched = None
+        self.pattern, self.flags, self.expression = None, re.IGNORECASE, False
+        if search is not None and not self.regex_search.match(search):
+            search = self.parse_entities(search)
+        self.mask = 0
+        for entity in self.has:
+            if entity not in Tweet.entity_flags:
+                raise Oops('Unknown entity "{0}", try: {1}'.format(
+                    entity, ', '.join(Tweet.entity_flags)))
+            self.mask |= Tweet.entity_flags[entity]
+        if search is not None:
+            regex = self.regex_search.match(search)
+            if regex:
+                self.pattern, options = regex.groups()
+                self.expression = True
+                if 'c' in options:
+                    self.flags = 0
+                if 'w' in options:
+                    self.pattern = r'\b(?:{0})\b'.format(self.pattern)
+            else:
+                self.pattern = re.escape(search.casefold())
+            try:
+                self.regex = re.compile(self.pattern, self.flags)
+            except re.error as error:
+                raise Oops('Invalid search "{0}": {1}'.format(search, error)) from None
+
+    def parse_entities(self, search):
+        """
+        Take the entity terms out of a plain text search.
+
+        :param search: The plain text search
+        :return: The remaining text to search for, None if nothing remains
+        """
+        terms = search.split()
+        entities = [self.entity_term.match(term) for term in terms]
+        if not any(entities):
+            return search
+        for entity in entities:
+            if entity and entity.group(1):
+                self.has += (entity.group(1).lower(),)
+            elif entity:
+                self.tags += (entity.group(2).lower(),)
+        return ' '.join(
+            term for term, entity in zip(terms, entities) if not entity
+        ) or None
+
+    @classmethod
+    def from_options(cls, options):
+        """
+        :param options: Options as parsed by "parse_options()":
+            --search=TEXT --span=YYYY-MM --exclude=read,retweets,...
+            --has=media,link,mention,hashtag
+        :return: The Selection
+        """
+        exclude, has = options.get('exclude'), options.get('has')
+        return cls(
+            search=options.get('search'),
+            span=options.get('span'),
+            exclude=exclude.split(',') if isinstance(exclude, str) else (),
+            has=has.split(',') if isinstance(has, str) else ()
+        )
+
+    @staticmethod
+    def excluded(exclusion, tweet, decisions):
+        """
+        :param exclusion: The name of the exclusion
+        :param tweet: The tweet to check
+        :param decisions: The Decisions, to check for already read tweets
+        :return: True if the tweet is filtered out by the exclusion
+        """
+        if exclusion == 'read':
+            return decisions.made(tweet.tweet_id)
+        if exclusion == 'retweets':
+            return tweet.is_retweet()
+        if exclusion == 'replies':
+            return tweet.is_reply()
+        return tweet.is_tweet()
+
+    def tweets(self, archive, decisions=None):
+        """
+        :param archive: The Archive to select from
+        :param decisions: The Decisions, required to exclude read tweets
+        :return: The selected tweets (generator)
+        """
+        for _, tweet in self.rows(archive, decisions):
+            yield tweet
+
+    @property
+    def name(self):
+        """The name of the selection, normalised criteria"""
+        return json.dumps(
+            {'search': self.search, 'span': self.span, 'exclude': sorted(self.exclude),
+             'has': sorted(set(self.has))},
+            sort_keys=True
+        )
+
+    @property
+    def query(self):
+        """The normalised search, span and entities, regardless of exclusions"""
+        return json.dumps(
+            {'search': self.search, 'span': self.span, 'has': sorted(set(self.has))},
+            sort_keys=True
+        )
+
+    def matches(self, tweet):
+        """
+        :param tweet: The tweet to check
+        :return: True if the tweet matches search, span and entities
+        """
+        if self.span is not None and not tweet.timestamp.startswith(self.span):
+            return False
+        if tweet.flags & self.mask != self.mask:
+            return False
+        if any(tag not in tweet.tags for tag in self.tags):
+            return False
+        if self.pattern is None:
+            return True
+        return bool(self.regex.search(tweet.text.casefold() if self.flags else tweet.text))
+
+    def indexed(self, archive):
+        """
+        :param archive: The Archive to select from
+        :return: Sorted candidate rows from the indices of the archive,
+            None if no index applies
+        """
+        if self.tags:
+            rows = set(archive.tagged(self.tags[0]))
+            for tag in self.tags[1:]:
+                rows.intersection_update(archive.tagged(tag))
+            return sorted(rows)
+        if self.expression and self.flags and archive.text_index() is not None:
+            return archive.text_index().search(self.pattern, self.flags)
+        return None
+
+    def candidates(self, archive, start=0):
+        """
+        Tweets that match search, span and entities. Hashtags, mentions and
+        case insensitive regular expressions are looked up in the indices of
+        the archive, all others check tweet by tweet. Rows already "matched"
+        (see SelectionCache) are taken as they are.
+
+        :param archive: The Archive to select from
+        :param start: Optional, the row of the archive to start at
+        :return: Tupels of archive row and tweet (generator)
+        """
+        rows = self.matched if self.matched is not None else self.indexed(archive)
+        if rows is not None:
+            for row in rows[bisect_left(rows, start):]:
+                tweet = archive.tweets[row]
+                if self.matched is not None or self.matches(tweet):
+                    yield row, tweet
+            return
+        for row, tweet in enumerate(archive.iterate(start), start):
+            if self.matches(tweet):
+                yield row, tweet
+
+    def rows(self, archive, decisions=None, start=0):
+        """
+        Lazy cursor over the archive, tweets are selected on demand.
+
+        :param archive: The Archive to select from
+        :param decisions: The Decisions, required to exclude read tweets
+        :param start: Optional, the row of the archive to start at
+        :return: Tupels of archive row and selected tweet (generator)
+        """
+        for row, tweet in self.candidates(archive, start):
+            if any(self.excluded(exclusion, tweet, decisions)
+                   for exclusion in self.exclude):
+                continue
+            yield row, tweet
+
+    def census(self, archive, decisions):
+        """
+        Count matching tweets by the exclusions they'd be filtered out by,
+        in a single pass, ignoring the exclusions of this selection.
+
+        :param archive: The Archive to select from
+        :param decisions: The Decisions, to check for already read tweets
+        :return: Counter of frozensets of exclusion names
+        """
+        census = Counter()
+        for _, tweet in self.candidates(archive):
+            census[frozenset(
+                    exclusion for exclusion in self.exclusions
+                    if self.excluded(exclusion, tweet, decisions)
+                )] += 1
+        return census
+
+    @staticmethod
+    def count(census, exclude):
+        """
+        :param census: The census, see "census()"
+        :param exclude: Names of exclusions to apply
+        :return: The number of tweets left
+        """
+        return sum(
+            count for exclusions, count in census.items() if not exclusions.intersection(exclude)
+        )
+
+
+class SelectionCache:
+    """
+    Memoised selections: matching rows and census of recent queries, least
+    recently used ones are evicted. Each entry remembers the generation of
+    the Decisions it was computed at, later changes are applied from their
+    journal instead of selecting from the archive again.
+    """
+
+    def __init__(self, size=16):
+        """
+        :param size: Number of queries to remember
+        """
+        self.size = size
+        self.entries = OrderedDict()
+
+    def census(self, selection, archive, decisions):
+        """
+        :param selection: The Selection, its rows are "matched" afterwards
+        :param archive: The Archive to select from
+        :param decisions: The Decisions, to check for already read tweets
+        :return: The census, see Selection.census() (Counter)
+        """
+        key = selection.query
+        entry = self.entries.pop(key, None)
+        changes = None if entry is None else decisions.changes(entry['generation'])
+        if entry is None or changes is None:
+            entry = self.select(selection, archive, decisions)
+        else:
+            self.update(entry, changes, selection, archive, decisions)
+        self.entries[key] = entry
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        selection.matched = entry['rows']
+        return Counter(entry['census'])
+
+    @staticmethod
+    def static(selection, tweet):
+        """:return: The exclusions of the tweet other than "read" (frozenset)"""
+        return frozenset(
+            exclusion for exclusion in selection.exclusions
+            if exclusion != 'read' and selection.excluded(exclusion, tweet, None)
+        )
+
+    def select(self, selection, archive, decisions):
+        """:return: A new entry, selected from the archive in one pass"""
+        rows, census, read = array('q'), Counter(), set()
+        for row, tweet in selection.candidates(archive):
+            rows.append(row)
+            exclusions = self.static(selection, tweet)
+            if decisions.made(tweet.tweet_id):
+                read.add(tweet.tweet_id)
+                exclusions |= {'read'}
+            census[exclusions] += 1
+        return {
+            'generation': decisions.generation, 'rows': rows, 'census': census, 'read': read
+        }
+
+    def update(self, entry, changes, selection, archive, decisions):
+        """Apply changed decisions to the read tweets of an entry."""
+        for subject in set(changes):
+            was_read, is_read = subject in entry['read'], decisions.made(subject)
+            if was_read == is_read:
+                continue
+            tweet = archive.find(subject)
+            if tweet is None or not selection.matches(tweet):
+                continue
+            exclusions = self.static(selection, tweet)
+            entry['census'][exclusions | {'read'} if was_read else exclusions] -= 1
+            entry['census'][exclusions if was_read else exclusions | {'read'}] += 1
+            if is_read:
+                entry['read'].add(subject)
+            else:
+                entry['read'].discard(subject)
+        entry['generation'] = decisions.generation
+
+
+class Cursors:
+    """
+    Reading positions of named selections, persisted in 'yatat.cursors'.
+    Concurrent sessions share the file, each one only writes the positions
+    it changed.
+    """
+
+    def __init__(self, work_dir):
+        """
+        :param work_dir: The working directory
+        """
+        self.path = '{0}/{1}'.format(work_dir, 'yatat.cursors')
+        self.positions = self.load()
+        self.changed = {}
+
+    def load(self):
+        """:return: The positions in the file (dict)"""
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def get(self, name, archive):
+        """
+        :param name: The name of the selection
+        :param archive: The Archive, to validate the position
+        :return: The row to resume at, or 0 to start at the beginning
+        """
+        row, tweet_id = self.positions.get(name, (0, None))
+        try:
+            if archive.tweets[row].tweet_id == tweet_id:
+                return row
+        except IndexError:
+            pass
+        return 0
+
+    def set(self, name, row, tweet_id):
+        """
+        :param name: The name of the selection
+        :param row: The archive row of the current tweet
+        :param tweet_id: The ID of the current tweet
+        """
+        self.positions[name] = self.changed[name] = row, tweet_id
+
+    def clear(self, name):
+        """:param name: The name of the selection to forget the position of"""
+        self.positions.pop(name, None)
+        self.changed[name] = None
+
+    def save(self):
+        """Merge the changed positions into the file."""
+        if not self.changed:
+            return
+        with open(self.path + '.lock', 'a', encoding='utf-8') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            positions = self.load()
+            for name, position in self.changed.items():
+                if position is None:
+                    positions.pop(name, None)
+                else:
+                    positions[name] = position
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(positions, file)
+            os.replace(self.path + '.tmp', self.path)
+        self.positions = positions
+        self.changed = {}
+
+
+class Export:
+    """Stream tweets joined with their decision state to JSONL or CSV files."""
+
+    fields = ('tweet_id', 'timestamp', 'kind', 'state', 'in_reply_to_status_id', 'text')
+
+    def __init__(self, decisions, states):
+        """
+        :param decisions: The Decisions to look up states
+        :param states: Pairs of (decision, state name) in order of precedence,
+            tweets without any of these decisions are "undecided"
+        """
+        self.decisions = decisions
+        self.states = states
+
+    def state(self, tweet):
+        """
+        :param tweet: The tweet
+        :return: The state name of the tweet
+        """
+        for decision, state in self.states:
+            if self.decisions.made(tweet.tweet_id, decision):
+                return state
+        return 'undecided'
+
+    def rows(self, tweets):
+        """
+        :param tweets: The tweets to export (iterable)
+        :return: The rows, one dict per tweet (generator)
+        """
+        for tweet in tweets:
+            yield {
+                'tweet_id': tweet.tweet_id,
+                'timestamp': tweet.timestamp,
+                'kind': 'retweet' if tweet.is_retweet()
+                        else 'reply' if tweet.is_reply() else 'tweet',
+                'state': self.state(tweet),
+                'in_reply_to_status_id': tweet.in_reply_to_status_id,
+                'text': tweet.text
+            }
+
+    def write(self, tweets, path, export_format=None, buffer_size=1 << 16):
+        """
+        :param tweets: The tweets to export (iterable)
+        :param path: The file to write
+        :param export_format: Optional, "csv" or "jsonl", defaults to "csv"
+            for "*.csv" files, otherwise "jsonl"
+        :param buffer_size: Size of the write buffer in bytes
+        :return: The number of exported tweets
+        """
+        if export_format is None:
+            export_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if export_format not in ('csv', 'jsonl'):
+            raise Oops('Unknown export format "{0}".'.format(export_format))
+        count = 0
+        with open(path, 'w', buffering=buffer_size, newline='', encoding='utf-8') as file:
+            if export_format == 'csv':
+                writer = csv.DictWriter(file, self.fields)
+                writer.writeheader()
+                for row in self.rows(tweets):
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in self.rows(tweets):
+                    file.write(json.dumps(row, ensure_ascii=False))
+                    file.write('\n')
+                    count += 1
+        return count
+
+
+class Server:  # pylint: disable=too-many-instance-attributes
+    """
+    Serves archive queries and decisions as JSON over HTTP from one long
+    lived process, so clients don't have to load the archive themselves.
+
+    GET    /tweets?search=&span=&exclude=&has=&offset=&limit=   Paged selection
+    GET    /tweets/<tweet_id>                                   One tweet
+    GET    /tweets/<tweet_id>/thread                            Thread up to tweet
+    POST   /tweets/<tweet_id>/<state>                           Decide
+    DELETE /tweets/<tweet_id>/<state>                           Revoke decision
+
+    GET responses are cached (LRU) until the next decision changes,
+    decisions are committed in the background every "commit_interval"
+    seconds and on shutdown. Serving a session, the decisions of other
+    sessions are merged at most every "merge_interval" seconds.
+    """
 
-__version__ = '1.0b1'
-__license__ = "Public Domain"
-__author__ = 'Sascha Schlindwein'
+    max_limit = 500
+    merge_interval = 1.0
+    commit_interval = 10.0
 
+    def __init__(self, archive, decisions, states, writable=None, cache_size=256):
+        """
+        :param archive: The Archive
+        :param decisions: The Decisions
+        :param states: Pairs of (decision, state name) in order of precedence,
+            see Export
+        :param writable: Optional, names of states clients may decide,
+            defaults to all states
+        :param cache_size: Number of cached GET responses
+        """
+        self.archive = archive
+        self.decisions = decisions
+        self.export = Export(decisions, states)
+        self.states = {
+            state: decision for decision, state in states
+            if writable is None or state in writable
+        }
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.generation = self.committed = decisions.generation
+        self.merged = perf_counter()
+        self.lock = threading.Lock()
 
-class Archive:
-    """The Archive loads and provides tweets from the Twitter archive data."""
+    def commit(self):
+        """Commit the decisions, if changed since the last commit."""
+        with self.lock:
+            if self.committed != self.decisions.generation:
+                self.decisions.commit()
+                self.committed = self.decisions.generation
 
-    def __init__(self, working_dir):
+    def autocommit(self, stopped):
         """
-        Load tweets from 'tweet.js' in the working directory.
+        :param stopped: Event to stop committing every "commit_interval" seconds
+        """
+        while not stopped.wait(self.commit_interval):
+            self.commit()
+
+    def refresh(self):
+        """Merge other sessions if due, drop cached responses once decisions changed."""
+        if self.decisions.session is not None \
+                and perf_counter() - self.merged >= self.merge_interval:
+            self.decisions.merge()
+            self.merged = perf_counter()
+        if self.generation != self.decisions.generation:
+            self.cache.clear()
+            self.generation = self.decisions.generation
+
+    def respond(self, method, path, query=''):
+        """
+        :param method: The HTTP method
+        :param path: The request path
+        :param query: The request query string
+        :return: Tupel of HTTP status and JSON body (int status, bytes body)
+        """
+        key = (path, query)
+        with self.lock:
+            self.refresh()
+            if method == 'GET' and key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            generation = self.generation
+        status, payload = self.route(method, path, query)
+        response = status, json.dumps(payload).encode('utf-8')
+        with self.lock:
+            self.refresh()
+            # Don't cache what was computed while decisions changed:
+            if method == 'GET' and status == 200 and generation == self.generation:
+                self.cache[key] = response
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return response
+
+    def route(self, method, path, query):  # pylint: disable=too-many-return-statements
+        """:return: Tupel of HTTP status and payload (int status, payload)"""
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'tweets' or len(parts) > 3:
+            return 404, {'error': 'Not found'}
+        if len(parts) == 1:
+            if method != 'GET':
+                return 405, {'error': 'Method not allowed'}
+            return self.page(query)
+        tweet = self.archive.find(parts[1])
+        if tweet is None:
+            return 404, {'error': 'No such tweet'}
+        if len(parts) == 2 and method == 'GET':
+            return 200, next(self.export.rows([tweet]))
+        if len(parts) == 3 and parts[2] == 'thread' and method == 'GET':
+            return 200, list(self.export.rows(self.archive.thread(tweet)))
+        if len(parts) == 3 and parts[2] in self.states and method in ('POST', 'DELETE'):
+            with self.lock:
+                if method == 'POST':
+                    self.decisions.decide(tweet.tweet_id, self.states[parts[2]])
+                else:
+                    self.decisions.revoke(tweet.tweet_id, self.states[parts[2]])
+            return 200, next(self.export.rows([tweet]))
+        return 405, {'error': 'Method not allowed'}
+
+    def page(self, query):
+        """:return: Tupel of HTTP status and one page of the selection"""
+        options = {name: values[-1] for name, values in parse_qs(query).items()}
+        try:
+            offset = max(0, int(options.pop('offset', 0)))
+            limit = min(self.max_limit, max(0, int(options.pop('limit', 50))))
+            selection = Selection.from_options(options)
+        except (ValueError, Oops) as error:
+            return 400, {'error': str(error)}
+        total, page = 0, []
+        for tweet in selection.tweets(self.archive, self.decisions):
+            if offset <= total < offset + limit:
+                page.append(tweet)
+            total += 1
+        return 200, {
+            'total': total, 'offset': offset, 'limit': limit,
+            'tweets': list(self.export.rows(page))
+        }
+
+    def serve(self, address):
+        """
+        Serve requests with one thread per request, until interrupted.
 
-        => Remember to remove the part "window.YTD.tweet.part0 = " from the
-        first line!
+        :param address: "port" or "host:port", host defaults to localhost
+        """
+        # pylint: disable=import-outside-toplevel
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        host, _, port = str(address).rpartition(':')
+        server = self
 
-        :param working_dir: The working directory that contains 'tweet.js' and
-        will be populated with other files
+        class RequestHandler(BaseHTTPRequestHandler):
+            """Hands requests to the server, answers with JSON."""
+
+            def reply(self):
+                """Answer a GET, POST or DELETE request."""
+                url = urlsplit(self.path)
+                status, body = server.respond(self.command, url.path, url.query)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_DELETE = reply
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            httpd = ThreadingHTTPServer((host or '127.0.0.1', int(port)), RequestHandler)
+        except ValueError:
+            raise Oops('Please give a port: --serve=[host:]port') from None
+        # Build the text index before request threads could race for it:
+        index = self.archive.text_index()
+        if index is not None:
+            index.start()
+        stopped = threading.Event()
+        threading.Thread(target=self.autocommit, args=(stopped,), daemon=True).start()
+        print('Serving on http://{0}:{1}/tweets'.format(*httpd.server_address[:2]))
+        try:
+            httpd.serve_forever()
+        finally:
+            stopped.set()
+            httpd.server_close()
+            self.commit()
+
+
+class Telemetry:
+    """
+    Live telemetry of a run of API calls: throughput, latency percentiles,
+    errors by type, remaining queue and ETA. Each call is appended as a JSON
+    line to a file, so runs can be compared over time.
+    """
+
+    def __init__(self, path, total, run=None):
         """
-        if not os.path.isdir(working_dir):
-            raise Oops('Working Directory "{0}" does not exist.'.format(working_dir))
+        :param path: The JSON lines file to append to
+        :param total: Number of calls planned in this run
+        :param run: Optional, name of the run, defaults to the start time
+        """
+        self.path = path
+        self.total = total
+        self.run = run or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.started = perf_counter()
+        self.latencies = []
+        self.errors = Counter()
+        self.succeeded = 0
+
+    @staticmethod
+    def classify(error):
+        """:return: The error type, with API code or HTTP status if available"""
+        code = getattr(error, 'api_code', None) \
+            or getattr(getattr(error, 'response', None), 'status_code', None)
+        name = type(error).__name__
+        return '{0}:{1}'.format(name, code) if code else name
+
+    def record(self, subject, latency, error=None):
+        """
+        :param subject: The subject of the call
+        :param latency: Duration of the call in seconds
+        :param error: Optional, the error raised by the call
+        """
+        self.latencies.append(latency)
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.errors[self.classify(error)] += 1
+        self.append({
+            'run': self.run, 'time': time(), 'subject': str(subject),
+            'latency': round(latency, 4),
+            'error': self.classify(error) if error is not None else None
+        })
+
+    def calls(self, since):
+        """
+        :param since: Wall-clock time to start at
+        :return: Wall-clock times of the calls recorded since then, by any
+            run (list)
+        """
+        times = []
+        if os.path.isfile(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    record = json.loads(line)
+                    if 'subject' in record and record['time'] > since:
+                        times.append(record['time'])
+        return sorted(times)
+
+    def finish(self):
+        """Append the summary of the run."""
+        self.append(dict(self.summary(), run=self.run, time=time()))
+
+    def append(self, record):
+        """:param record: The record to append as JSON line"""
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record) + '\n')
+
+    def percentile(self, percent):
+        """
+        :param percent: The percentile, like 95
+        :return: The latency percentile in seconds (nearest rank)
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[max(0, -(-len(latencies) * percent // 100) - 1)]
+
+    def summary(self):
+        """:return: The telemetry of the run so far (dict)"""
+        elapsed = perf_counter() - self.started
+        done = len(self.latencies)
+        remaining = max(0, self.total - done)
+        return {
+            'elapsed': round(elapsed, 1),
+            'succeeded': self.succeeded,
+            'per_minute': round(self.succeeded * 60 / elapsed, 1) if elapsed else 0.0,
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'errors': dict(self.errors),
+            'remaining': remaining,
+            'eta': round(remaining * elapsed / done) if done else None
+        }
 
-        path_to_archive = '{0}/{1}'.format(working_dir, 'tweet.js')
+    def __repr__(self):
+        summary = self.summary()
+        return '{0}/min, latency p50 {1}s p95 {2}s p99 {3}s, errors: {4}, ' \
+               'remaining: {5}, ETA: {6}'.format(
+                   summary['per_minute'], summary['p50'], summary['p95'], summary['p99'],
+                   ', '.join('{0}={1}'.format(*item) for item in sorted(
+                       summary['errors'].items())) or 'none',
+                   summary['remaining'],
+                   '?' if summary['eta'] is None else timedelta(seconds=summary['eta'])
+               )
+
+
+class BulkExecutor:
+    """
+    Runs API calls on many subjects in parallel threads, spaced evenly to
+    stay within a rate limit.
+    """
 
-        if not os.path.isfile(path_to_archive):
-            raise Oops('File "{0}" does not exist.'.format(path_to_archive))
+    def __init__(self, call, rate=1.0, workers=4, telemetry=None):
+        """
+        :param call: The API call, called with one subject
+        :param rate: Maximum number of calls per second
+        :param workers: Number of parallel threads
+        :param telemetry: Optional, the Telemetry to record calls
+        """
+        self.call = call
+        self.interval = 1.0 / rate
+        self.workers = workers
+        self.telemetry = telemetry
+        self.lock = threading.Lock()
+        self.next_call = perf_counter()
+
+    def wait(self):
+        """Wait for the next free slot within the rate limit."""
+        with self.lock:
+            now = perf_counter()
+            slot = max(now, self.next_call)
+            self.next_call = slot + self.interval
+        if slot > now:
+            sleep(slot - now)
+
+    def execute(self, subject):
+        """
+        :param subject: The subject to call the API with
+        :return: The error, if any, otherwise None
+        """
+        self.wait()
+        started = perf_counter()
+        error = None
+        try:
+            self.call(subject)
+        except Exception as exception:  # pylint: disable=broad-except
+            error = exception
+        if self.telemetry:
+            with self.lock:
+                self.telemetry.record(subject, perf_counter() - started, error)
+        return error
+
+    def run(self, subjects, done):
+        """
+        :param subjects: The subjects (iterable)
+        :param done: Called with each subject after a successful call, in
+            the calling thread
+        :return: Tupel of the numbers of succeeded and failed calls
+        """
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        succeeded = failed = 0
+        subjects = iter(subjects)
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending = {}
+            while True:
+                for subject in islice(subjects, self.workers * 2 - len(pending)):
+                    pending[pool.submit(self.execute, subject)] = subject
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    subject = pending.pop(future)
+                    if future.result() is None:
+                        done(subject)
+                        succeeded += 1
+                    else:
+                        failed += 1
+        return succeeded, failed
+
+
+class Daemon:  # pylint: disable=too-many-instance-attributes
+    """
+    Drains a queue of decided subjects headless and around the clock, with
+    at most "quota" API calls per sliding "window" of seconds. Decisions of
+    concurrent sessions are merged as they are logged, so the queue grows
+    while reviewers keep deciding.
 
-        self.tweets = []
+    A local control socket accepts one command per connection and answers
+    with a JSON line: pause, resume, status or stop.
+    """
 
-        with open(path_to_archive) as archive_data_file:
-            for json_obj in json.load(archive_data_file):
-                self.tweets.append(Tweet(json_obj['tweet']))
+    commands = ('pause', 'resume', 'status', 'stop')
 
-        print('Loaded', len(self.tweets), 'tweets from', path_to_archive)
+    def __init__(self, decisions, call, pending, done, skip=(),  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 quota=300, window=900.0, telemetry=None, attempts=3, poll=10.0):
+        """
+        :param decisions: The Decisions, preferably of a session
+        :param call: The API call, called with one subject
+        :param pending: The decision of queued subjects
+        :param done: The decision for subjects that are done
+        :param skip: Optional, decisions that take queued subjects out
+        :param quota: Maximum number of calls per window
+        :param window: Length of the quota window in seconds
+        :param telemetry: Optional, the Telemetry to record calls
+        :param attempts: Number of failed calls until a subject is left out
+            for this run
+        :param poll: Seconds to wait for new decisions when idle or paused
+        """
+        self.decisions = decisions
+        self.call = call
+        self.pending, self.done, self.skip = pending, done, tuple(skip)
+        self.quota, self.window = quota, window
+        self.telemetry = telemetry
+        self.attempts, self.poll = attempts, poll
+        # Calls of former runs count against the quota, too:
+        self.calls = deque(telemetry.calls(time() - window) if telemetry else ())
+        self.failures = Counter()
+        self.paused = self.stopped = False
+        self.state = 'starting'
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+
+    def queue(self):
+        """:return: The subjects still to call, in order (generator)"""
+        if self.decisions.session is not None:
+            self.decisions.merge()
+        for subject in list(self.decisions.decision(self.pending)[1]):
+            if self.failures[subject] < self.attempts \
+                    and not self.decisions.made(subject, self.done) \
+                    and not any(self.decisions.made(subject, skip) for skip in self.skip):
+                yield subject
+
+    def delay(self):
+        """:return: Seconds until the quota allows the next call, 0 if now"""
+        now = time()
+        while self.calls and self.calls[0] <= now - self.window:
+            self.calls.popleft()
+        if len(self.calls) < self.quota:
+            return 0
+        return (self.calls[0] if self.calls else now) + self.window - now
+
+    def step(self):
+        """
+        Call the API with the next subject, if not paused and within quota.
 
-    def find(self, tweet_id):
+        :return: Seconds to wait before the next step, 0 to go on
         """
-        :param tweet_id: The ID of the tweet to find
-        :return: The tweet, if available, otherwise None
+        with self.lock:
+            if self.paused:
+                self.state = 'paused'
+                return self.poll
+            subject = next(self.queue(), None)
+            if subject is None:
+                self.state = 'idle'
+                return self.poll
+            delay = self.delay()
+            if delay:
+                self.state = 'waiting'
+                return delay
+            self.state = 'running'
+            self.calls.append(time())
+        started, error = perf_counter(), None
+        try:
+            self.call(subject)
+        except Exception as exception:  # pylint: disable=broad-except
+            error = exception
+        with self.lock:
+            if self.telemetry:
+                self.telemetry.record(subject, perf_counter() - started, error)
+            if error is None:
+                self.decisions.decide(subject, self.done)
+                self.decisions.revoke(subject, self.pending)
+            else:
+                self.failures[subject] += 1
+        print(datetime.now().strftime('%Y-%m-%d %H:%M:%S'), self.done, subject,
+              'OK' if error is None else 'Error {0}'.format(error))
+        return 0
+
+    def control(self, command):
         """
-        for tweet in self.tweets:
-            if tweet.tweet_id == str(tweet_id):
-                return tweet
-        return None
+        :param command: One of "commands"
+        :return: The answer (dict)
+        """
+        with self.lock:
+            if command == 'pause':
+                self.paused = True
+            elif command == 'resume':
+                self.paused = False
+            elif command == 'stop':
+                self.stopped = True
+            elif command != 'status':
+                return {'error': 'Unknown command "{0}", try: {1}'.format(
+                    command, ', '.join(self.commands))}
+        self.wakeup.set()
+        return self.status()
+
+    def status(self):
+        """:return: The state, queue length, quota usage and telemetry (dict)"""
+        with self.lock:
+            status = {
+                'state': 'stopped' if self.stopped else (
+                    'paused' if self.paused else self.state),
+                'queued': sum(1 for _ in self.queue()),
+                'done': self.decisions.count(self.done),
+                'failed': sorted(
+                    subject for subject, count in self.failures.items()
+                    if count >= self.attempts),
+                'quota': self.quota,
+                'window': self.window,
+                'calls_in_window': len(self.calls),
+                'next_call_in': round(self.delay(), 1)
+            }
+        if self.telemetry:
+            with self.lock:
+                self.telemetry.total = len(self.telemetry.latencies) + status['queued']
+                status['telemetry'] = self.telemetry.summary()
+        return status
+
+    def run(self, socket_path=None):
+        """
+        Drain the queue until stopped by command, ctrl-c or SIGTERM.
 
-    def index(self):
+        :param socket_path: Optional, path of the control socket
         """
-        :return: A sorted string of date based indices, the "%Y-%M" (7 chars)
-            portion of "tweet.timestamp".
+        server = self.listen(socket_path) if socket_path else None
+        terminate = signal.signal(signal.SIGTERM, self.terminate) \
+            if threading.current_thread() is threading.main_thread() else None
+        try:
+            while not self.stopped:
+                delay = self.step()
+                if delay and not self.stopped:
+                    self.wakeup.wait(delay)
+                    self.wakeup.clear()
+        finally:
+            if terminate is not None:
+                signal.signal(signal.SIGTERM, terminate)
+            if server:
+                server.shutdown()
+                server.server_close()
+                os.remove(socket_path)
+            if self.telemetry:
+                self.telemetry.finish()
+
+    def terminate(self, *_):
         """
-        index, magic = set(), 7
-        for tweet in self.tweets:
-            index.add(tweet.timestamp[:magic])
-        return ', '.join(sorted(index))
+        Stop on SIGTERM. Signal handlers interrupt the main thread anywhere,
+        even while it holds the lock, so don't take it here.
+        """
+        self.stopped = True
+        self.wakeup.set()
+
+    def listen(self, socket_path):
+        """
+        Answer control commands on a Unix socket in a background thread.
+
+        :param socket_path: Path of the control socket
+        :return: The socket server
+        """
+        # pylint: disable=import-outside-toplevel
+        from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+        daemon = self
 
+        class ControlHandler(StreamRequestHandler):
+            """Answers one command per connection with a JSON line."""
 
-class Tweet:
-    """It's all about tweets!"""
+            def handle(self):
+                """Read a command, write the daemon's answer."""
+                command = self.rfile.readline().decode('utf-8').strip().lower()
+                self.wfile.write(json.dumps(daemon.control(command)).encode('utf-8') + b'\n')
 
-    def __init__(self, json_tweet):
+        if os.path.exists(socket_path):
+            try:
+                Daemon.send(socket_path, 'status')
+            except OSError:
+                os.remove(socket_path)  # Left over by a crashed daemon
+            else:
+                raise Oops('Daemon already running, see: {0}'.format(socket_path))
+        server = ThreadingUnixStreamServer(socket_path, ControlHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    @staticmethod
+    def send(socket_path, command):
         """
-        :param json_tweet: The tweet portion as extracted from 'tweet.js'
+        :param socket_path: Path of the control socket
+        :param command: The command to send
+        :return: The answer of the daemon (dict)
         """
-        self.tweet_id = json_tweet["id"]
-        self.text = json_tweet["full_text"]
-        self.timestamp = datetime.strftime(datetime.strptime(
-                json_tweet["created_at"], '%a %b %d %H:%M:%S +0000 %Y'
-            ), '%Y-%m-%d %H:%M:%S' )
-        self.in_reply_to_status_id = \
-            json_tweet["in_reply_to_status_id"] \
-                if "in_reply_to_status_id" in json_tweet else None
+        # pylint: disable=import-outside-toplevel
+        import socket
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(10)
+            connection.connect(socket_path)
+            connection.sendall(command.encode('utf-8') + b'\n')
+            return json.loads(connection.makefile('rb').readline().decode('utf-8'))
 
-    def __repr__(self):
-        """String representation: 'YYYY-MM-DD <tweet_id> <text>'"""
-        return '{0} {1} {2}'.format(self.timestamp[:10], self.tweet_id, self.text)
 
-    def is_reply(self):
-        """Tweets with an "in_reply_to_status_id" set are replies."""
-        return self.in_reply_to_status_id is not None
+# Patterns which may anchor at the start or end of a text:
+ANCHORS = re.compile(r'[$^]|\\[AZ]')
 
-    def is_retweet(self):
-        """Tweets text starting with "RT @" are interpreted as retweets."""
-        return self.text.startswith("RT @")
 
-    def is_tweet(self):
-        """Tweets that are not retweets and not replies are tweets. ;)"""
-        return not self.is_retweet() and not self.is_reply()
+def search_text(pattern, flags, buffer, offsets, first=0, last=None):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """
+    Search a buffer of separated texts, see TextIndex.
+
+    :param pattern: The regular expression
+    :param flags: The regular expression flags
+    :param buffer: The texts, each one terminated by a separator
+    :param offsets: Start offset of each text plus the end of the buffer
+    :param first: Optional, the first row to search
+    :param last: Optional, the row to stop at, defaults to all rows
+    :return: The sorted rows of matching texts (list)
+    """
+    regex = re.compile(pattern, flags)
+    last = len(offsets) - 1 if last is None else last
+    if ANCHORS.search(pattern):
+        # Anchors only hold within a single text, search text by text:
+        return [
+            row for row in range(first, last)
+            if regex.search(buffer[offsets[row]:offsets[row + 1] - 1])
+        ]
+    rows, position, end = [], offsets[first], offsets[last]
+    while position < end:
+        match = regex.search(buffer, position, end)
+        if not match:
+            break
+        row = bisect_right(offsets, match.start(), first, last + 1) - 1
+        row_end = offsets[row + 1] - 1
+        # Matches must not span texts, look for another one within the text:
+        if match.end() <= row_end or regex.search(buffer[offsets[row]:row_end]):
+            rows.append(row)
+        position = offsets[row + 1]
+    return rows
+
+
+def map_int64(filename):
+    """
+    :param filename: Binary file of native int64 values
+    :return: The values, memory-mapped from the file (memoryview or
+        empty array)
+    """
+    with open(filename, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            return array('q')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast('q')
 
 
-class Decisions:
+def json_array_items(file, chunk_size=1 << 16):
     """
-    Make persistent decisions about subjects!
+    Read the items of a JSON array one by one, without loading the whole
+    document into memory.
 
-    The related use-case is that we want to store meta information about
-    tweets that we already browsed in the archive. We want to remember
-    tweets that we'd like to keep or to destroy (later).
+    :param file: The file that contains the JSON array
+    :param chunk_size: Number of characters to read at once
+    :return: The items (generator)
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    opened = False
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            chunk = file.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+        if position == len(buffer):
+            raise Oops('Unexpected end of JSON array.')
+        if not opened:
+            if buffer[position] != '[':
+                raise Oops('JSON array expected.')
+            position, opened = position + 1, True
+            continue
+        if buffer[position] == ']':
+            return
+        while True:
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = file.read(chunk_size)
+                buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+        yield item
 
-    The "subject" is a tweet_id and the related "decision" might be
-    either "keep" or "destroy" or anything else.
 
-    Decisions are mapped lazy to files, so *please use valid file names*
-    as possible decision keys.
+def twitter_api(auth_yaml):
     """
+    The Twitter backend, tweepy and its HTTP stack are imported on demand
+    to keep offline startup fast.
 
-    def __init__(self, work_dir, possible_decisions):
-        """
-        :param work_dir: The working directory for decision files
-        :param possible_decisions: All possible decisions
-        """
-        self.work_dir = work_dir
-        self.possible_decisions = possible_decisions
-        self.decisions = {}
-        for decision, _, filename in self.possible():
-            with open(filename, 'a') as touch:
-                touch.close()
-            with open(filename, 'r') as file:
-                subjects = {line.strip() for line in file.readlines()}
-            self.decisions[decision] = subjects
+    :param auth_yaml: Path to the auth.yaml file
+    :return: The authenticated tweepy API
+    """
+    # Promotion for https://twitter.com/Karlsruher
+    from karlsruher import tweepyx  # pylint: disable=import-outside-toplevel
+    return tweepyx.API(auth_yaml, True)
 
-    def commit(self):
-        """Write subjects and decisions to files."""
-        for _, subjects, filename in self.possible():
-            with open(filename, 'w') as file:
-                file.writelines(['{0}\n'.format(subject) for subject in subjects])
 
-    def possible(self):
-        """:return: All possible decisions (generator)"""
-        for decision in self.possible_decisions:
-            yield self.decision(decision)
+class FakeAPI:
+    """
+    Local fake backend, pretends to be the Twitter API without any network
+    access. Useful for trial runs and testing.
+    """
 
-    def decision(self, decision):
+    def __init__(self, screen_name=None):
         """
-        :param decision: The decision
-        :return: Tupel of the given decision, its subjects and related
-            filename (str decision, set subjects, str filename)
+        :param screen_name: Optional, the name to display
         """
-        return (
-            decision,
-            self.decisions[decision] if decision in self.decisions else None,
-            '/'.join([self.work_dir, decision])
-        )
+        self.screen_name = screen_name or 'fake'
+        self.destroyed = []
 
-    def decide(self, subject, decision):
-        """
-        :param subject: The subject to decide about
-        :param decision: The decision
-        """
-        self.decisions[decision].add(str(subject))
+    def me(self):  # pylint: disable=invalid-name
+        """:return: The authenticated user, this fake"""
+        return self
 
-    def revoke(self, subject, decision):
-        """
-        :param subject: The subject to revoke the decision from
-        :param decision: The decision to revoke
-        """
-        if str(subject) in self.decisions[decision]:
-            self.decisions[decision].remove(str(subject))
+    def destroy_status(self, tweet_id):
+        """:param tweet_id: The tweet to forget about"""
+        self.destroyed.append(str(tweet_id))
 
-    def count(self, decision):
-        """
-        :param decision:
-        :return: The number of subjects for the given decision
-        """
-        subjects = self.decision(decision)[1]
-        return len(subjects)
+    def destroy_favorite(self, tweet_id):
+        """:param tweet_id: The tweet to unlike"""
+        self.destroyed.append(str(tweet_id))
 
-    def made(self, subject, explicit_decision=None):
-        """
-        :param subject: The subject to check
-        :param explicit_decision: Optional, an explicit decision
-        :return: True if decision was made on subject, otherwise False
-        """
-        for decision, subjects, _ in self.possible():
-            if explicit_decision:
-                if decision == explicit_decision and str(subject) in subjects:
-                    return True
-            else:
-                if str(subject) in subjects:
-                    return True
-        return False
+    def unretweet(self, tweet_id):
+        """:param tweet_id: The retweet to undo"""
+        self.destroyed.append(str(tweet_id))
+
+
+# Available backends, each is called with an optional argument:
+BACKENDS = {'twitter': twitter_api, 'fake': FakeAPI}
+
+
+def backend(name):
+    """
+    :param name: Name of a known backend or "module:factory" to plug in
+    :return: The backend factory
+    """
+    if name in BACKENDS:
+        return BACKENDS[name]
+    try:
+        module, _, factory = name.partition(':')
+        return getattr(import_module(module), factory)
+    except (ImportError, AttributeError, ValueError):
+        raise Oops('Unknown backend "{0}".'.format(name)) from None
+
+
+def parse_options(argv):
+    """
+    Separate "--option" and "--option=value" options from arguments.
+
+    :param argv: sys.argv as given at command line
+    :return: Tupel of positional arguments and options
+        (list arguments, dict options)
+    """
+    arguments, options = [], {}
+    for arg in argv:
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            options[name] = value if value else True
+        else:
+            arguments.append(arg)
+    return arguments, options
 
 
 def clear_screen():
@@ -200,7 +2574,7 @@ def clear_screen():
 
 
 # pylint: disable=too-many-branches,bare-except,missing-docstring
-class UserInterface:
+class UserInterface:  # pylint: disable=too-many-instance-attributes
     """
     Commandline UI to wire Archive and Decisions classes to an application.
     """
@@ -211,23 +2585,87 @@ class UserInterface:
     # Declare possible decisions about tweets:
     keep, destroy, destroyed = 'yatat.keep', 'yatat.destroy', 'yatat.destroyed'
 
-    def __init__(self, argv):
+    # Declare possible decisions about likes and retweets:
+    unlike, unliked = 'yatat.unlike', 'yatat.unliked'
+    unretweet, unretweeted = 'yatat.unretweet', 'yatat.unretweeted'
+
+    # Control socket of the daemon, in the working directory:
+    socket = 'yatat.sock'
+
+    def __init__(self, argv):  # pylint: disable=too-many-statements
         """
         :param argv: sys.argv as given at command line
         """
+        argv, options = parse_options(argv)
         if len(argv) < 2:
-            print('Usage: $ {0} /path/to/workdir [/path/to/auth.yaml]'.format(argv[0]))
+            print('Usage: $ {0} /path/to/workdir [/path/to/auth.yaml] [--compact] [--text]'
+                  ' [--backend=twitter|fake|module:factory] [--session[=NAME]] [--budget=MB]'
+                  ' [--rate=CALLS_PER_SECOND] [--workers=THREADS]'.format(argv[0]))
+            print('Export: $ {0} /path/to/workdir --export=/path/to/file.jsonl|csv'
+                  ' [--search=TEXT] [--span=YYYY-MM] [--exclude=read,retweets,replies,tweets]'
+                  ' [--has=media,link,mention,hashtag]'
+                  .format(argv[0]))
+            print('Server: $ {0} /path/to/workdir --serve=[host:]port'.format(argv[0]))
+            print('Daemon: $ {0} /path/to/workdir [/path/to/auth.yaml] --daemon'
+                  ' [--quota=CALLS] [--window=SECONDS] [--backend=twitter|fake|module:factory]'
+                  .format(argv[0]))
+            print('Control: $ {0} /path/to/workdir --control=pause|resume|status|stop'
+                  .format(argv[0]))
             return
 
         work_dir = argv[1]
-        self.archive = Archive(work_dir)
-        possible_decisions = {self.keep, self.destroy, self.destroyed}
-        self.decisions = Decisions(work_dir, possible_decisions)
+        if 'control' in options:
+            # Headless, talk to a running daemon and leave
+            try:
+                print(json.dumps(Daemon.send(
+                    '/'.join([work_dir, self.socket]), str(options['control'])
+                ), indent=2))
+            except OSError:
+                raise Oops('No daemon running in {0}'.format(work_dir)) from None
+            return
+        if 'budget' in options:
+            try:
+                self.archive = DiskArchive(work_dir, int(options['budget']))
+            except ValueError:
+                raise Oops('Please give the memory budget in MB: --budget=64') from None
+        else:
+            self.archive = Archive(work_dir, compact='compact' in options)
+        self.options = options
+        self.cursors = Cursors(work_dir)
+        self.selections = SelectionCache()
+        session = options.get('session', 'daemon' if 'daemon' in options else None)
+        if session is True:
+            session = '{0}-{1}'.format(os.uname().nodename, os.getpid())
+        self.decisions = Decisions(
+            work_dir, {self.keep, self.destroy, self.destroyed}, text='text' in options,
+            session=session, reviewed={self.keep, self.destroy}
+        )
+        # Likes and retweets to undo, apart from reading tweets:
+        self.reactions = Decisions(
+            work_dir, {self.unlike, self.unliked, self.unretweet, self.unretweeted},
+            text='text' in options, session=session, log_prefix='yatat.reaction.'
+        )
 
         try:
-            if len(argv) == 3:
+            if 'export' in options:
+                # Headless, export and leave
+                self.export(options)
+                return
+            if 'serve' in options:
+                # Headless, serve until interrupted
+                Server(
+                    self.archive, self.decisions, self.states(), ('keep', 'destroy')
+                ).serve(options['serve'])
+                return
+            if 'daemon' in options:
+                # Headless, drain the destroy queue until stopped
+                self.daemon(argv[2] if len(argv) == 3 else None)
+                return
+            if len(argv) == 3 or 'backend' in options:
                 # Go online, connect api
-                self.api = tweepyx.API(argv[2], True)
+                self.api = backend(options.get('backend', 'twitter'))(
+                    argv[2] if len(argv) == 3 else None
+                )
                 self.display_username = self.api.me().screen_name
                 print('Authenticated as:', self.display_username)
                 sleep(0.75)
@@ -245,6 +2683,8 @@ class UserInterface:
         finally:
             # Always persist decisions
             self.decisions.commit()
+            self.reactions.commit()
+            self.report_conflicts()
             print('Cheers!')
 
     def __repr__(self):
@@ -275,10 +2715,25 @@ Yatat v{0} - @{1}'s tweet archive
             nr_of_tweets_to_destroy, nr_of_tweets_already_destroyed
         )
 
+    def report_conflicts(self):
+        """Print decisions that concurrent sessions disagree about."""
+        conflicts = self.decisions.conflicts()
+        if conflicts:
+            print('Conflicting decisions of sessions, last one wins:')
+            for subject, sessions in sorted(conflicts.items()):
+                print(' ', subject, ', '.join(
+                    '{0}: {1}'.format(session, decision)
+                    for session, decision in sorted(sessions.items())
+                ))
+
     def loop(self):
         """The application loop."""
         user_did_not_quit = True
         while user_did_not_quit:
+            if self.decisions.session is not None:
+                # Pick up decisions of concurrent sessions
+                self.decisions.merge()
+                self.reactions.merge()
             clear_screen()
             # pylint: disable=bad-indentation
             print('''
@@ -288,30 +2743,58 @@ Menu:
   A - Read all tweets chronologically
   T - Read tweets by time span
   S - Search tweets for text
+  D - Decide near-duplicates in bulk
+  I - Show statistics
   X - Delete marked tweets
+  L - Unlike liked tweets
+  R - Undo retweets
   Q - Quit
 
 ==========================================
             '''.strip().format(self))
             user_did_not_quit = self.action(input('> ').strip().upper())
 
-    def action(self, action):
+    def action(self, action):  # pylint: disable=too-many-return-statements
         if action == 'Q':
             print('Quit.')
             return False
         if action == 'X':
             return self.destroy_tweets()
+        if action == 'L':
+            return self.bulk(
+                'likes', (like.tweet_id for like in self.archive.likes),
+                self.unlike, self.unliked, 'destroy_favorite'
+            )
+        if action == 'R':
+            return self.bulk(
+                'retweets', (
+                    tweet.tweet_id for tweet in self.archive.tweets
+                    if tweet.is_retweet() and not self.decisions.made(tweet.tweet_id)
+                ),
+                self.unretweet, self.unretweeted, 'unretweet'
+            )
+        if action == 'D':
+            return self.duplicates()
+        if action == 'I':
+            clear_screen()
+            print(self)
+            print(Statistics(self.archive.tweets, self.decisions))
+            print('\nHit ENTER to go back...')
+            input()
+            return True
         if action == 'A':
             print('All...')
-            tweets = list(self.archive.tweets)
+            selection = Selection()
         elif action == 'S':
             clear_screen()
-            print('\nSearch')
-            search = input('? ').strip().lower()
-            tweets = [
-                tweet for tweet in self.archive.tweets
-                if search in tweet.text.lower()
-            ]
+            print('\nSearch text or /regex/ (flags: c = case sensitive, w = whole words)')
+            print('Text may contain #hashtag, @mention and has:media|link|mention|hashtag')
+            try:
+                selection = Selection(search=input('? ').strip())
+            except Oops as error:
+                print(error, '- hit ENTER to go back...')
+                input()
+                return True
         elif action == 'T':
             clear_screen()
             print('\nAvailable:', self.archive.index())
@@ -319,78 +2802,130 @@ Menu:
             selector = input('? ').strip()
             if not selector:
                 selector = '-'
-            tweets = [
-                tweet for tweet in self.archive.tweets
-                if tweet.timestamp.startswith(selector)
-            ]
+            selection = Selection(span=selector)
         else:
             return True
 
-        self.filter(tweets)
-        self.browse(tweets)
+        self.browse(selection, self.filter(selection))
         return True
 
-    def filter(self, tweets):
-        if tweets:
-            clear_screen()
-            print(self)
-            print('\nHaving', len(tweets), 'tweets to read.')
-            print('Filter out already read tweets? [y|n] Y')
-            if input('? ').strip().upper() != 'N':
-                for tweet in list(tweets):
-                    if self.decisions.made(tweet.tweet_id):
-                        tweets.remove(tweet)
-        if tweets:
-            clear_screen()
-            print(self)
-            print('\nStill', len(tweets), 'tweets...')
-            print('Filter out retweets? [y|n] Y')
-            if input('? ').strip().upper() != 'N':
-                for tweet in list(tweets):
-                    if tweet.is_retweet():
-                        tweets.remove(tweet)
-        if tweets:
-            clear_screen()
-            print(self)
-            print('\nStill', len(tweets), 'tweets...')
-            print('Filter out replies? [y|n] N')
-            if input('? ').strip().upper() == 'Y':
-                for tweet in list(tweets):
-                    if tweet.is_reply():
-                        tweets.remove(tweet)
-        if tweets:
+    def filter(self, selection):
+        """
+        Ask for exclusions and add them to the selection.
+
+        :param selection: The Selection
+        :return: The number of selected tweets
+        """
+        census = self.selections.census(selection, self.archive, self.decisions)
+        exclude = []
+        for exclusion, question, default in (
+                ('read', 'Filter out already read tweets?', 'Y'),
+                ('retweets', 'Filter out retweets?', 'Y'),
+                ('replies', 'Filter out replies?', 'N'),
+                ('tweets', 'Filter out tweets?', 'N')):
+            count = Selection.count(census, exclude)
+            if not count:
+                break
             clear_screen()
             print(self)
-            print('\nStill', len(tweets), 'tweets...')
-            print('Filter out tweets? [y|n] N')
-            if input('? ').strip().upper() == 'Y':
-                for tweet in list(tweets):
-                    if tweet.is_tweet():
-                        tweets.remove(tweet)
-
-    def browse(self, tweets):
+            if exclude or exclusion != 'read':
+                print('\nStill', count, 'tweets...')
+            else:
+                print('\nHaving', count, 'tweets to read.')
+            print('{0} [y|n] {1}'.format(question, default))
+            answer = input('? ').strip().upper()
+            if answer == 'Y' or (answer != 'N' and default == 'Y'):
+                exclude.append(exclusion)
+        selection.exclude = tuple(exclude)
+        return Selection.count(census, exclude)
+
+    def states(self):
+        """:return: Pairs of (decision, state name) in order of precedence"""
+        return (self.destroyed, 'destroyed'), (self.keep, 'keep'), (self.destroy, 'destroy')
+
+    def export(self, options):
+        """
+        Export the selected tweets and their decision state.
+
+        :param options: The command line options, see Selection.from_options()
+        """
+        path = options['export']
+        if not isinstance(path, str):
+            raise Oops('Please name the export file: --export=/path/to/file')
+        count = Export(self.decisions, self.states()).write(
+            Selection.from_options(options).tweets(self.archive, self.decisions),
+            path, options.get('format')
+        )
+        print('Exported', count, 'tweets to', path)
+
+    def browse(self, selection, count):
+        """
+        Read the selected tweets, resume at the last position if available.
+
+        :param selection: The Selection
+        :param count: The number of selected tweets
+        """
         clear_screen()
         print(self)
-        if tweets:
+        if count:
+            name = selection.name
+            start = self.cursors.get(name, self.archive)
             try:
-                print('\n{0} tweets to read, hit ENTER to start...'.format(len(tweets)))
-                input()
-                for tweet in tweets:
+                print('\n{0} tweets to read{1}, hit ENTER to start...'.format(
+                    count, ', resuming where you stopped (R to restart)' if start else ''
+                ))
+                if input().strip().upper() == 'R':
+                    start = 0
+                for row, tweet in selection.rows(self.archive, self.decisions, start):
+                    self.cursors.set(name, row, tweet.tweet_id)
                     if self.decide(tweet) == 'Q':
                         break
+                else:
+                    self.cursors.clear(name)
             except KeyboardInterrupt:
                 print('Aborted.')
+            finally:
+                self.cursors.save()
         else:
             print('\nNo tweets to read, hit ENTER to go back...')
             input()
 
-    def decide(self, tweet):
+    def duplicates(self):
+        """
+        Review clusters of unread near-duplicates, one representative each,
+        the decision applies to the whole cluster.
+        :return: True
+        """
+        clear_screen()
+        print(self)
+        print('\nClustering unread tweets...')
+        clusters = Clusters(Selection(exclude=('read',)).tweets(
+            self.archive, self.decisions
+        )).clusters
+        print('\n{0} clusters of {1} similar tweets to read, hit ENTER to start...'
+              .format(len(clusters), sum(len(cluster) for cluster in clusters)))
+        input()
+        try:
+            for cluster in clusters:
+                if self.decide(cluster[0], cluster[1:]) == 'Q':
+                    break
+        except KeyboardInterrupt:
+            print('Aborted.')
+        return True
+
+    def decide(self, tweet, similar=()):
+        """
+        :param tweet: The tweet to decide about
+        :param similar: Optional, similar tweets that share the decision
+        :return: The user input
+        """
+        subjects = [tweet.tweet_id] + [other.tweet_id for other in similar]
         clear_screen()
         # pylint: disable=bad-indentation
         print('''
 {0}
 
-{1}
+{1}{2}
 
 ------------------------------------------
 
@@ -400,7 +2935,10 @@ Menu:
      Q - Quit reading
 
 ==========================================
-        '''.strip().format(self, self.pretty(tweet)))
+        '''.strip().format(
+            self, self.pretty(tweet),
+            '\n\n-> and {0} similar tweets'.format(len(similar)) if similar else ''
+        ))
         decision = input('\n> ').strip().upper()
         if decision == 'C':
             print('DECIDE LATER')
@@ -416,7 +2954,7 @@ Menu:
  | |_| || |___ | |___ | |___   | |  | |___
  |____/ |_____||_____||_____|  |_|  |_____|
             '''.strip().format(self))
-            self.decisions.decide(tweet.tweet_id, self.destroy)
+            self.decisions.decide_all(subjects, self.destroy)
             sleep(0.2)
         elif decision != 'Q':
             clear_screen()
@@ -429,7 +2967,7 @@ Menu:
  | . \ | |___|| |___ |  __/
  |_|\_\|_____||_____||_|
             '''.strip().format(self))
-            self.decisions.decide(tweet.tweet_id, self.keep)
+            self.decisions.decide_all(subjects, self.keep)
             sleep(0.2)
         return decision
 
@@ -453,6 +2991,87 @@ Menu:
             return '-> is part of a thread:\n{0}\n---\n\n'.format(self.pretty(parent))
         return '-> is a reply:\n---\n\n'
 
+    def bulk(self, name, subjects, pending, done, call):
+        """
+        Mark subjects and work them off with parallel, rate limited API calls.
+
+        :param name: The name of the subjects, like "likes"
+        :param subjects: All candidate subjects (iterable)
+        :param pending: The decision for marked subjects
+        :param done: The decision for subjects that are done
+        :param call: The name of the API method to call with each subject
+        :return: True
+        """
+        clear_screen()
+        print(self)
+        unmarked = [
+            subject for subject in subjects
+            if not self.reactions.made(subject, pending) and not self.reactions.made(subject, done)
+        ]
+        print('\n{0} {1} not marked yet, mark them all? [y|n] N'.format(len(unmarked), name))
+        if input('? ').strip().upper() == 'Y':
+            self.reactions.decide_all(unmarked, pending)
+        queue = [
+            subject for subject in self.reactions.decision(pending)[1]
+            if not self.reactions.made(subject, done)
+        ]
+        if not self.api:
+            print('\n{0} {1} marked, API not connected, you are offline!'.format(len(queue), name))
+            print('Hit ENTER to go back...')
+            input()
+            return True
+        try:
+            rate = float(self.options.get('rate', 1.0))
+            workers = int(self.options.get('workers', 4))
+        except ValueError:
+            raise Oops('Please give numbers: --rate=1.0 --workers=4') from None
+        print('\n{0} {1} marked, hit ENTER to start...'.format(len(queue), name))
+        input()
+
+        def finished(subject):
+            self.reactions.decide(subject, done)
+            self.reactions.revoke(subject, pending)
+
+        telemetry = Telemetry(
+            '{0}/{1}'.format(self.reactions.work_dir, 'yatat.telemetry.jsonl'), len(queue)
+        )
+        try:
+            succeeded, failed = BulkExecutor(
+                getattr(self.api, call), rate, workers, telemetry
+            ).run(queue, finished)
+            print(succeeded, 'succeeded,', failed, 'failed.')
+        except KeyboardInterrupt:  # pragma: no cover
+            print('Aborted.')
+        finally:
+            telemetry.finish()
+        print(' ', telemetry)
+        print('Hit ENTER to go back...')
+        input()
+        return True
+
+    def daemon(self, auth_yaml):
+        """
+        Drain the destroy queue headless, within the quota of API calls.
+
+        :param auth_yaml: Optional, path to the auth.yaml file
+        """
+        try:
+            quota = int(self.options.get('quota', 300))
+            window = float(self.options.get('window', 900))
+        except ValueError:
+            raise Oops('Please give numbers: --quota=300 --window=900') from None
+        self.api = backend(self.options.get('backend', 'twitter'))(auth_yaml)
+        work_dir = self.reactions.work_dir
+        daemon = Daemon(
+            self.decisions, self.api.destroy_status, self.destroy, self.destroyed,
+            skip=(self.keep,), quota=quota, window=window,
+            telemetry=Telemetry('/'.join([work_dir, 'yatat.telemetry.jsonl']), 0, 'daemon')
+        )
+        print('Daemon session "{0}" draining {1}, at most {2} calls per {3}s,'
+              ' control: {4}'.format(self.reactions.session, self.destroy, quota, window,
+                                     '/'.join([work_dir, self.socket])))
+        daemon.run('/'.join([work_dir, self.socket]))
+
     def destroy_tweets(self):
         """
         Destroy all selected tweets if API connection is present
@@ -469,15 +3088,22 @@ Menu:
         tweets_to_destroy = self.decisions.decision(self.destroy)[1]
         nr_of_tweets_to_destroy = len(tweets_to_destroy)
         clear_screen()
+        telemetry = None
         try:
             print('{0} tweets marked to DESTROY, hit ENTER to start...'
                   .format(nr_of_tweets_to_destroy))
             input()
             destroyed_tweets_count = 0
+            telemetry = Telemetry(
+                '{0}/{1}'.format(self.decisions.work_dir, 'yatat.telemetry.jsonl'),
+                nr_of_tweets_to_destroy
+            )
             for tweet_to_destroy in tweets_to_destroy:
                 if self.decisions.made(tweet_to_destroy, self.keep):
+                    telemetry.total -= 1
                     continue
                 if self.decisions.made(tweet_to_destroy, self.destroyed):
+                    telemetry.total -= 1  # pragma: no cover
                     continue # pragma: no cover
                 print(
                     'DESTROYING',
@@ -485,15 +3111,22 @@ Menu:
                     self.archive.find(tweet_to_destroy)
                 )
                 sleep(1.5)
+                started = perf_counter()
                 try:
                     self.api.destroy_status(tweet_to_destroy)
+                    telemetry.record(tweet_to_destroy, perf_counter() - started)
                     self.decisions.decide(tweet_to_destroy, self.destroyed)
                     destroyed_tweets_count += 1
                 # pylint: disable=broad-except
-                except Exception as error:  # pragma: no cover
+                except Exception as error:
+                    telemetry.record(tweet_to_destroy, perf_counter() - started, error)
                     print("Error", error)
+                print(' ', telemetry)
         except KeyboardInterrupt:  # pragma: no cover
             print('Aborted.')
+        finally:
+            if telemetry:
+                telemetry.finish()
 
         print('Cleaning up.')
         for destroyed_tweet in self.decisions.decision(self.destroyed)[1]:
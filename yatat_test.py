@@ -8,11 +8,17 @@ import io
 
 from unittest import mock, TestCase
 from unittest.mock import patch
+import subprocess
 import tempfile
+import threading
+from time import perf_counter, sleep
 
 import contextlib
+from collections import deque
 
-from yatat import Archive, Tweet, Decisions, UserInterface, Oops
+from yatat import Archive, DiskArchive, ExternalSort, json_array_items, Tweet, TextStore, IdSet, Decisions, Statistics, Clusters, TextIndex, Selection, SelectionCache, Cursors, search_text, Export, Server, Telemetry, BulkExecutor, Daemon, FakeAPI, backend, UserInterface, Oops
+import csv
+import json
 
 
 @contextlib.contextmanager
@@ -64,6 +70,89 @@ class TweetTest(TestCase):
         self.assertFalse(tweet.is_tweet())
         self.assertFalse(tweet.is_reply())
 
+    def test_entities(self):
+        """Flag entities, tag hashtags and mentions"""
+        self.assertEqual((0, ()), (Tweet(self.json).flags, Tweet(self.json).tags))
+        self.json['entities'] = {
+            'hashtags': [{'text': 'Yatat'}], 'user_mentions': [{'screen_name': 'Foo'}],
+            'urls': [], 'media': [{'type': 'photo'}]
+        }
+        tweet = Tweet(self.json)
+        self.assertEqual(('#yatat', '@foo'), tweet.tags)
+        self.assertEqual(1 | 4 | 8, tweet.flags)
+        self.json['entities'] = {'urls': [{'url': 'https://t.co'}]}
+        self.json['extended_entities'] = {'media': [{'type': 'video'}]}
+        self.assertEqual((1 | 2, ()), Tweet.entities(self.json))
+
+
+class TextStoreTest(TestCase):
+
+    def test_deduplicate(self):
+        """Equal texts share a slot"""
+        store = TextStore(block_size=2)
+        self.assertEqual(0, store.add(3, 'RT @Test ...'))
+        self.assertEqual(1, store.add(1, 'Hello'))
+        self.assertEqual(0, store.add(2, 'RT @Test ...'))
+        self.assertEqual(2, len(store))
+        self.assertEqual('RT @Test ...', store.get(0))
+        store.seal()
+        self.assertEqual(['Hello', 'RT @Test ...', 'RT @Test ...'], [
+            store.text(tweet_id) for tweet_id in ('1', '2', '3')
+        ])
+        self.assertRaises(KeyError, store.text, '4')
+
+    def test_grow(self):
+        """The lookup table grows with the distinct texts"""
+        store = TextStore()
+        for number in range(3000):
+            self.assertEqual(number % 2000, store.add(number, 'text {0}'.format(number % 2000)))
+        self.assertEqual(2000, len(store))
+        self.assertEqual(4096, len(store.table))
+        store.seal()
+        self.assertIsNone(store.table)
+        self.assertEqual('text 999', store.text(2999))
+
+    def test_blocks_and_cache(self):
+        """Texts are served from compressed blocks and pending texts"""
+        store = TextStore(block_size=2, cache_size=1)
+        texts = ['text {0} ä'.format(number) for number in range(5)]
+        slots = [store.add(number, text) for number, text in enumerate(texts)]
+        store.seal()
+        self.assertEqual(2, len(store.blocks))
+        self.assertEqual(['text 4 ä'], store.pending)
+        self.assertEqual(texts, [store.get(slot) for slot in slots])
+        self.assertEqual(1, len(store.cache))
+        self.assertEqual(5, store.add(5, 'text 0 ä'))
+
+    def test_threads(self):
+        """Serve texts to concurrent readers"""
+        store = TextStore(block_size=1, cache_size=1)
+        texts = ['text {0}'.format(number) for number in range(50)]
+        slots = [store.add(number, text) for number, text in enumerate(texts)]
+        store.seal()
+        results = []
+
+        def read():
+            results.append([store.get(slot) for slot in slots * 20] == texts * 20)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([True] * 4, results)
+
+    def test_tweet_text(self):
+        """Tweets read their text from the store"""
+        store = TextStore()
+        tweet = Tweet({
+            'id': '0', 'created_at': 'Thu Feb 02 14:05:28 +0000 2012',
+            'full_text': 'RT @TEST ...'
+        }, store)
+        self.assertIs(store, tweet.text_source)
+        self.assertEqual('RT @TEST ...', tweet.text)
+        self.assertTrue(tweet.is_retweet())
+
 
 class ArchiveTestCase(TestCase):
 
@@ -86,8 +175,14 @@ class ArchiveTestCase(TestCase):
     { "tweet" : {
             "id" : "44444",
             "created_at" : "Sat Sep 19 19:19:44 +0000 2020",
-            "full_text" : "Foo only!",
-            "in_reply_to_status_id" : "11111"
+            "full_text" : "Foo only! #Yatat",
+            "in_reply_to_status_id" : "11111",
+            "in_reply_to_screen_name" : "test_username",
+            "entities" : {
+                "hashtags" : [ { "text" : "Yatat", "indices" : [ "10", "16" ] } ],
+                "user_mentions" : [ { "screen_name" : "test_username", "id" : "1" } ],
+                "urls" : [ ]
+            }
     }},
     { "tweet" : {
             "id" : "55555",
@@ -98,7 +193,14 @@ class ArchiveTestCase(TestCase):
             "id" : "66666",
             "created_at" : "Sat Sep 19 19:19:59 +0000 2020",
             "full_text" : "Baz, please!",
-            "in_reply_to_status_id" : "44444"
+            "in_reply_to_status_id" : "44444",
+            "entities" : {
+                "hashtags" : [ ],
+                "urls" : [ { "expanded_url" : "https://example.com" } ]
+            },
+            "extended_entities" : {
+                "media" : [ { "type" : "photo" } ]
+            }
     }}]'''.strip()
 
     def setUp(self):
@@ -110,6 +212,13 @@ class ArchiveTestCase(TestCase):
         with open(self.tweets_json_file, 'w') as f:
                 f.write(self.json_test_data + '\n')
 
+    def write_likes(self):
+        path = '{}/like.js'.format(self.work_dir)
+        with open(path, 'w') as f:
+            f.write('[{"like": {"tweetId": "77777", "fullText": "Liked!"}},'
+                    ' {"like": {"tweetId": "88888"}}]')
+        self.addCleanup(os.remove, path)
+
     def tearDown(self):
         if os.path.exists(self.tweets_json_file):
             os.remove(self.tweets_json_file)
@@ -119,6 +228,9 @@ class ArchiveTestCase(TestCase):
             os.remove(self.kill_file)
         if os.path.exists(self.kill2_file):
             os.remove(self.kill2_file)
+        for filename in os.listdir(self.work_dir):
+            if filename.startswith('yatat.'):
+                os.remove(os.path.join(self.work_dir, filename))
 
 
 class ArchiveTest(ArchiveTestCase):
@@ -159,6 +271,92 @@ class ArchiveTest(ArchiveTestCase):
         a = Archive(self.work_dir)
         self.assertEqual('2020-08, 2020-09', a.index())
 
+    def test_likes(self):
+        """Load likes, if available"""
+        self.assertEqual([], Archive(self.work_dir).likes)
+        self.write_likes()
+        likes = Archive(self.work_dir).likes
+        self.assertEqual(['77777', '88888'], [like.tweet_id for like in likes])
+        self.assertEqual('like 77777 Liked!', str(likes[0]))
+        self.assertEqual('', likes[1].text)
+
+    def test_compact(self):
+        """Keep texts in a TextStore"""
+        archive = Archive(self.work_dir, compact=True)
+        self.assertEqual(6, len(archive.tweets))
+        self.assertEqual(6, len(archive.text_store))
+        self.assertIsNone(archive.text_store.table)
+        self.assertEqual('RT @Test3 ...', archive.find('33333').text)
+
+
+class DiskArchiveTest(ArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tweets = json.loads(self.json_test_data)
+        with open(self.tweets_json_file, 'w') as f:
+            json.dump(list(reversed(tweets)), f)
+
+    def test_json_array_items(self):
+        """Read JSON arrays item by item"""
+        self.assertEqual([{'a': 1}, [2], 'x'], list(json_array_items(io.StringIO(
+            ' [ {"a": 1} ,\n [2], "x" ] '
+        ), chunk_size=2)))
+        self.assertEqual([], list(json_array_items(io.StringIO('[]'))))
+        self.assertRaises(Oops, list, json_array_items(io.StringIO('{}')))
+        self.assertRaises(Oops, list, json_array_items(io.StringIO('[{"a": 1}, ')))
+        self.assertRaises(ValueError, list, json_array_items(io.StringIO('[{"a": ')))
+
+    def test_sorted_table(self):
+        """Spill, merge and page in tweets"""
+        with managed_io():
+            archive = DiskArchive(self.work_dir, budget=0)
+        self.assertEqual(6, len(archive.tweets))
+        self.assertEqual(
+            ['11111', '22222', '33333', '44444', '55555', '66666'],
+            [tweet.tweet_id for tweet in archive.tweets]
+        )
+        self.assertEqual('66666', archive.tweets[-1].tweet_id)
+        self.assertRaises(IndexError, archive.tweets.__getitem__, 6)
+        self.assertEqual('Foo only! #Yatat', archive.find('44444').text)
+        self.assertIsNone(archive.find('12345'))
+        self.assertIsNone(archive.find('no such tweet'))
+        self.assertEqual('2020-08, 2020-09', archive.index())
+        self.assertEqual(3, len(archive.thread(archive.find(66666))))
+        self.assertEqual([3], list(archive.tagged('@test_username')))
+        self.assertEqual([], list(archive.tagged('#nothing')))
+        self.assertEqual(['66666'], [tweet.tweet_id for tweet in Selection(
+            search='has:media').tweets(archive)])
+        self.assertFalse([name for name in os.listdir(self.work_dir) if '.run' in name])
+        with open(archive.path, encoding='utf-8') as table:
+            rows = table.read()
+        self.assertFalse('entities' in rows)
+        self.assertTrue('"tags": ["#yatat", "@test_username"]' in rows)
+
+    def test_external_sort(self):
+        """Merge runs in bounded passes, entity index per line"""
+        sort = ExternalSort(os.path.join(self.work_dir, 'sort'), budget=0)
+        sort.fan_in = 2
+        numbers = ['{0:03d}\n'.format(n) for n in range(7)]
+        for number in reversed(numbers):
+            sort.add(number)
+        self.assertEqual(numbers, list(sort))
+        with patch('yatat.ExternalSort.fan_in', 2), managed_io():
+            archive = DiskArchive(self.work_dir, budget=0)
+        self.assertEqual('Foo only! #Yatat', archive.find('44444').text)
+        self.assertEqual('66666', archive.find('66666').tweet_id)
+        self.assertEqual([3], list(archive.tagged('@test_username')))
+        self.assertFalse([name for name in os.listdir(self.work_dir) if '.run' in name])
+
+    def test_reuse_table(self):
+        """Reuse the table while it's up to date"""
+        with managed_io():
+            DiskArchive(self.work_dir)
+        with patch('yatat.DiskArchive.build') as build:
+            with managed_io():
+                self.assertEqual(6, len(DiskArchive(self.work_dir).tweets))
+            build.assert_not_called()
+
 
 class DecisionsTest(ArchiveTestCase):
 
@@ -185,9 +383,19 @@ class DecisionsTest(ArchiveTestCase):
             self.decisions.decide(subject, 'a')
         for subject in [1,2,3,4,5,6,7]:
             self.decisions.decide(subject, 'b')
-        self.assertEqual(3, self.decisions.count('a'))
+        self.assertEqual(0, self.decisions.count('a'))
         self.assertEqual(7, self.decisions.count('b'))
 
+    def test_last_decision_wins(self):
+        """A later decision replaces the former one, with or without session"""
+        for session in (None, 'alice'):
+            decisions = Decisions(self.work_dir, ['a', 'b'], session=session)
+            decisions.decide(5, 'a')
+            decisions.decide_all([5, 6], 'b')
+            decisions.decide(6, 'a')
+            self.assertEqual(['6'], list(decisions.decision('a')[1]))
+            self.assertEqual(['5'], list(decisions.decision('b')[1]))
+
     def test_decisions_made(self):
         """Decisions are unique"""
         for subject in [1,1,1,2,2,3,3]:
@@ -198,6 +406,17 @@ class DecisionsTest(ArchiveTestCase):
         self.assertTrue(self.decisions.made(4,'b'))
         self.assertFalse(self.decisions.made(4,'a'))
 
+    def test_revoke(self):
+        """Only revoking a decision that was made counts as a change"""
+        self.decisions.decide(1, 'a')
+        generation = self.decisions.generation
+        self.decisions.revoke('2', 'a')
+        self.decisions.revoke('1', 'b')
+        self.assertEqual(generation, self.decisions.generation)
+        self.decisions.revoke('1', 'a')
+        self.assertEqual(['1'], self.decisions.changes(generation))
+        self.assertFalse(self.decisions.made(1))
+
     def test_can_remember_decisions(self):
         """Remembering decisions"""
         self.decisions.decide(8, 'a')
@@ -205,6 +424,693 @@ class DecisionsTest(ArchiveTestCase):
         self.assertEqual(1, len(Decisions(self.work_dir, ['a']).decision('a')[1]))
         self.assertTrue('8' in Decisions(self.work_dir, ['a']).decision('a')[1])
 
+    def test_decide_all(self):
+        """Decide about many subjects at once"""
+        self.decisions.decide_all([1, 2, 2, '3'], 'a')
+        self.assertEqual(3, self.decisions.count('a'))
+
+    def test_plain_text(self):
+        """Import plain text files, export them on demand"""
+        with open('{}/yatat.text'.format(self.work_dir), 'w') as file:
+            file.write('11\n22\n')
+        decisions = Decisions(self.work_dir, ['yatat.text'], text=True)
+        self.assertEqual(2, decisions.count('yatat.text'))
+        decisions.revoke(11, 'yatat.text')
+        decisions.commit()
+        with open('{}/yatat.text'.format(self.work_dir)) as file:
+            self.assertEqual('22\n', file.read())
+        self.assertEqual(['22'], list(Decisions(self.work_dir, ['yatat.text']).decision('yatat.text')[1]))
+
+    def test_import_once(self):
+        """Imported plain text survives a load without commit, is never imported again"""
+        with open('{}/yatat.text'.format(self.work_dir), 'w') as file:
+            file.write('11\nnot a tweet\n22\n')
+        with managed_io() as (out):
+            decisions = Decisions(self.work_dir, ['yatat.text'])
+        self.assertTrue('Skipped 1 invalid lines' in out.getvalue())
+        self.assertEqual(['11', '22'], list(decisions.decision('yatat.text')[1]))
+        decisions = Decisions(self.work_dir, ['yatat.text'])
+        self.assertEqual(['11', '22'], list(decisions.decision('yatat.text')[1]))
+        decisions.revoke('11', 'yatat.text')
+        decisions.commit()
+        with open('{}/yatat.text'.format(self.work_dir), 'a') as file:
+            file.write('33\n')
+        self.assertEqual(['22'], list(Decisions(self.work_dir, ['yatat.text']).decision('yatat.text')[1]))
+
+
+class StatisticsTest(ArchiveTestCase):
+
+    def test_single_pass(self):
+        """Count per month and top lists"""
+        decisions = Decisions(self.work_dir, ['yatat.keep'])
+        decisions.decide('11111', 'yatat.keep')
+        statistics = Statistics(Archive(self.work_dir).tweets, decisions)
+        self.assertEqual(['2020-08', '2020-09'], sorted(statistics.months))
+        self.assertEqual(1, statistics.months['2020-08']['decided'])
+        self.assertEqual(1, statistics.months['2020-09']['tweets'])
+        self.assertEqual(2, statistics.months['2020-09']['retweets'])
+        self.assertEqual(2, statistics.months['2020-09']['replies'])
+        self.assertEqual({'test_username': 1}, dict(statistics.reply_targets))
+        self.assertEqual({'Test3': 1, 'Test5': 1}, dict(statistics.retweeted))
+        self.assertEqual({'yatat': 1}, dict(statistics.hashtags))
+        self.assertTrue(' 2020-08         1        0        0    100%' in str(statistics))
+        self.assertTrue('#yatat' in str(statistics))
+
+
+class ClustersTest(TestCase):
+
+    def tweets(self, *texts):
+        return [
+            Tweet({'id': str(index), 'created_at': 'Thu Feb 02 14:05:28 +0000 2012',
+                   'full_text': text})
+            for index, text in enumerate(texts)
+        ]
+
+    def test_near_duplicates(self):
+        """Cluster near-duplicates, keep distinct tweets apart"""
+        clusters = Clusters(self.tweets(
+            "I'm at Cafe Central in Karlsruhe, Germany https://t.co/abc",
+            'Something completely different, nothing to see here.',
+            "I'm at Cafe Central in Karlsruhe, Germany https://t.co/xyz",
+            "I'm at Cafe Central in Karlsruhe, Germany! https://t.co/123",
+            'Just posted a photo https://t.co/1',
+            'Just posted a photo https://t.co/2',
+        )).clusters
+        self.assertEqual(
+            [['0', '2', '3'], ['4', '5']],
+            [[tweet.tweet_id for tweet in cluster] for cluster in clusters]
+        )
+
+    def test_nothing_similar(self):
+        """No clusters without near-duplicates"""
+        self.assertEqual([], Clusters(self.tweets('Hello, world!', 'Foo, Bar & Baz.', '')).clusters)
+
+
+class TextIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = TextIndex([
+            Tweet({'id': str(number), 'created_at': 'Thu Feb 02 14:05:28 +0000 2012',
+                   'full_text': text})
+            for number, text in enumerate(['Straße', 'foo', 'bar', 'foo bar', 'FOO'])
+        ])
+
+    def test_search(self):
+        """Map matches to rows"""
+        self.assertEqual('strasse\x00foo\x00', self.index.buffer[:12])
+        self.assertEqual([1, 3, 4], self.index.search('foo'))
+        self.assertEqual([0], self.index.search('strasse'))
+        self.assertEqual([3], self.index.search('foo.bar'))
+        self.assertEqual([], self.index.search('foo.{2,3}bar$'))
+        self.assertEqual([3], self.index.search('o.ba'))
+        self.assertEqual([2, 3], self.index.search('bar$'))
+        self.assertEqual([0, 1, 2, 3, 4], self.index.search(''))
+
+    def test_parallel(self):
+        """Search chunks in a persistent pool of processes"""
+        self.addCleanup(self.index.close)
+        with patch('yatat.TextIndex.parallel_threshold', 0):
+            self.assertEqual([1, 3, 4], self.index.search('foo', processes=2))
+            pool = self.index.pool
+            self.assertEqual([3], self.index.search('o.ba', processes=2))
+            self.assertEqual([2, 3], self.index.search('bar$', processes=3))
+        self.assertIs(pool, self.index.pool)
+        self.assertEqual([2], search_text('bar', 0, self.index.buffer, self.index.offsets, 1, 3))
+
+
+class SelectionTest(ArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive = Archive(self.work_dir)
+        self.decisions = Decisions(self.work_dir, ['yatat.keep'])
+
+    def ids(self, selection):
+        return [tweet.tweet_id for tweet in selection.tweets(self.archive, self.decisions)]
+
+    def test_shared_index(self):
+        """Threads share one index and one pool"""
+        indexes, pools = [], []
+
+        def search():
+            indexes.append(self.archive.text_index())
+            pools.append(indexes[-1].start(processes=2))
+
+        with patch('yatat.TextIndex.parallel_threshold', 0):
+            threads = [threading.Thread(target=search) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.addCleanup(indexes[0].close)
+        self.assertEqual(1, len({id(index) for index in indexes}))
+        self.assertEqual(1, len({id(pool) for pool in pools}))
+        self.assertIsNotNone(pools[0])
+
+    def test_criteria(self):
+        """Select by search, span and exclusions"""
+        self.assertEqual(6, len(self.ids(Selection())))
+        self.assertEqual(['22222', '44444'], self.ids(Selection(search='FOO')))
+        self.assertEqual(['11111'], self.ids(Selection(span='2020-08')))
+        self.assertEqual(
+            ['11111', '22222'], self.ids(Selection(exclude=('retweets', 'replies')))
+        )
+        self.decisions.decide('11111', 'yatat.keep')
+        self.assertEqual(['22222'], self.ids(Selection(exclude=('read', 'retweets', 'replies'))))
+        self.assertRaises(Oops, Selection, exclude=('unknown',))
+
+    def test_lazy_rows(self):
+        """Select lazily from a given row on"""
+        rows = Selection(exclude=('retweets',)).rows(self.archive, self.decisions, 2)
+        self.assertEqual((3, '44444'), (lambda row, tweet: (row, tweet.tweet_id))(*next(rows)))
+        self.assertEqual([5], [row for row, _ in rows])
+
+    def test_census(self):
+        """Count by exclusions in one pass"""
+        self.decisions.decide('11111', 'yatat.keep')
+        selection = Selection(span='2020')
+        census = selection.census(self.archive, self.decisions)
+        self.assertEqual(6, Selection.count(census, ()))
+        self.assertEqual(5, Selection.count(census, ('read',)))
+        self.assertEqual(3, Selection.count(census, ('read', 'retweets')))
+        self.assertEqual(1, Selection.count(census, ('read', 'retweets', 'replies')))
+        self.assertEqual(0, Selection.count(census, Selection.exclusions))
+        self.assertNotEqual(selection.name, Selection(span='2020', exclude=('read',)).name)
+
+    def test_regex(self):
+        """Search regular expressions"""
+        self.assertEqual(['22222', '66666'], self.ids(Selection(search='/baz/')))
+        self.assertEqual(['22222', '66666'], self.ids(Selection(search='/^(foo|baz),/')))
+        self.assertEqual([], self.ids(Selection(search='/baz/c')))
+        self.assertEqual(['22222', '66666'], self.ids(Selection(search='/Baz/c')))
+        self.assertEqual(['11111'], self.ids(Selection(search='/wor/')))
+        self.assertEqual([], self.ids(Selection(search='/wor/w')))
+        self.assertEqual(['11111'], self.ids(Selection(search='/world/w')))
+        self.assertEqual(['11111'], self.ids(Selection(search='HELLO')))
+        self.assertEqual([], self.ids(Selection(search='hello.*foo')))
+        self.assertRaises(Oops, Selection, search='/(/')
+        with managed_io():
+            self.archive = Archive(self.work_dir)
+            compact = Archive(self.work_dir, compact=True)
+        self.ids(Selection(search='hello'))
+        self.assertIsNone(self.archive.texts)
+        self.ids(Selection(search='/hello/'))
+        self.assertIsNotNone(self.archive.texts)
+        self.assertEqual(['11111'], [tweet.tweet_id for tweet in Selection(
+            search='/hello/').tweets(compact)])
+        self.assertIsNone(compact.texts)
+
+    def test_entities(self):
+        """Select by entities"""
+        self.assertEqual(['44444'], self.ids(Selection(search='#yatat')))
+        self.assertEqual(['44444'], self.ids(Selection(search='@Test_Username #YATAT')))
+        self.assertEqual(['44444'], self.ids(Selection(search='foo @test_username')))
+        self.assertEqual([], self.ids(Selection(search='baz @test_username')))
+        self.assertEqual(['66666'], self.ids(Selection(search='has:media')))
+        self.assertEqual(['44444', '66666'], self.ids(Selection(has=('hashtag',))) + self.ids(
+            Selection(has=('link',))))
+        self.assertEqual([], self.ids(Selection(search='has:link', span='2020-08')))
+        self.assertEqual([], self.ids(Selection(search='/@test_username/')))
+        self.assertEqual([3], list(self.archive.tagged('#yatat')))
+        self.assertRaises(Oops, Selection, search='has:nothing')
+        self.assertEqual(['66666'], self.ids(Selection.from_options({'has': 'media,link'})))
+
+    def test_from_options(self):
+        """Create selection from command line options"""
+        selection = Selection.from_options(
+            {'search': 'Baz', 'span': '2020-09', 'exclude': 'replies'}
+        )
+        self.assertEqual(['22222'], self.ids(selection))
+
+
+class SelectionCacheTest(ArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive = Archive(self.work_dir)
+        self.decisions = Decisions(self.work_dir, ['yatat.keep', 'yatat.destroy'])
+        self.cache = SelectionCache(size=2)
+
+    def test_incremental(self):
+        """Reuse entries, apply new decisions only"""
+        selection = Selection(search='foo')
+        census = self.cache.census(selection, self.archive, self.decisions)
+        self.assertEqual([1, 3], list(selection.matched))
+        self.assertEqual(2, Selection.count(census, ('read',)))
+        self.decisions.decide('44444', 'yatat.keep')
+        self.decisions.decide('55555', 'yatat.keep')
+        with patch.object(SelectionCache, 'select') as select:
+            census = self.cache.census(Selection(search='foo'), self.archive, self.decisions)
+            self.decisions.revoke('44444', 'yatat.keep')
+            self.decisions.decide('22222', 'yatat.destroy')
+            self.decisions.decide('22222', 'yatat.keep')
+            updated = self.cache.census(Selection(search='foo'), self.archive, self.decisions)
+        select.assert_not_called()
+        self.assertEqual(1, Selection.count(census, ('read',)))
+        self.assertEqual(1, Selection.count(updated, ('read',)))
+        self.assertEqual(updated, Selection(search='foo').census(self.archive, self.decisions))
+        selection.exclude = ('read',)
+        self.assertEqual(['44444'], [tweet.tweet_id for tweet in selection.tweets(
+            self.archive, self.decisions)])
+
+    def test_eviction(self):
+        """Evict least recently used entries, recompute beyond the journal"""
+        for span in ('2020-08', '2020-09', '2020-08', '2020'):
+            self.cache.census(Selection(span=span), self.archive, self.decisions)
+        self.assertEqual(
+            ['{"has": [], "search": null, "span": "2020-08"}',
+             '{"has": [], "search": null, "span": "2020"}'],
+            list(self.cache.entries)
+        )
+        self.decisions.journal = deque(maxlen=1)
+        self.decisions.decide_all(['11111', '22222'], 'yatat.keep')
+        self.assertIsNone(self.decisions.changes(0))
+        self.assertEqual(['22222'], self.decisions.changes(1))
+        census = self.cache.census(Selection(span='2020'), self.archive, self.decisions)
+        self.assertEqual(4, Selection.count(census, ('read',)))
+
+
+class ServerTest(ArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.decisions = Decisions(self.work_dir, ['yatat.keep', 'yatat.destroy'])
+        self.server = Server(
+            Archive(self.work_dir), self.decisions,
+            (('yatat.keep', 'keep'), ('yatat.destroy', 'destroy')), ('destroy',)
+        )
+
+    def request(self, method, path, query=''):
+        status, body = self.server.respond(method, path, query)
+        return status, json.loads(body.decode('utf-8'))
+
+    def test_pages(self):
+        """Serve paged selections"""
+        status, page = self.request('GET', '/tweets', 'search=foo&limit=1&offset=1')
+        self.assertEqual(200, status)
+        self.assertEqual(2, page['total'])
+        self.assertEqual(['44444'], [row['tweet_id'] for row in page['tweets']])
+        self.assertEqual(400, self.request('GET', '/tweets', 'limit=many')[0])
+        self.assertEqual(400, self.request('GET', '/tweets', 'exclude=unknown')[0])
+        self.assertEqual(404, self.request('GET', '/nothing')[0])
+        self.assertEqual(405, self.request('POST', '/tweets')[0])
+
+    def test_tweets_and_threads(self):
+        """Serve tweets and threads"""
+        self.assertEqual('Hello, world!', self.request('GET', '/tweets/11111')[1]['text'])
+        self.assertEqual(404, self.request('GET', '/tweets/12345')[0])
+        status, thread = self.request('GET', '/tweets/66666/thread')
+        self.assertEqual(200, status)
+        self.assertEqual(['11111', '44444', '66666'], [row['tweet_id'] for row in thread])
+
+    def test_decide_and_revoke(self):
+        """Decisions invalidate cached responses"""
+        self.assertEqual('undecided', self.request('GET', '/tweets/11111')[1]['state'])
+        self.assertEqual(1, len(self.server.cache))
+        self.assertEqual('destroy', self.request('POST', '/tweets/11111/destroy')[1]['state'])
+        self.assertEqual(0, len(self.server.cache))
+        self.assertTrue(self.decisions.made('11111', 'yatat.destroy'))
+        self.assertEqual(405, self.request('POST', '/tweets/11111/keep')[0])
+        self.assertEqual('undecided', self.request('DELETE', '/tweets/11111/destroy')[1]['state'])
+
+    def test_commit(self):
+        """Decisions are committed in the background, not per request"""
+        self.request('POST', '/tweets/11111/destroy')
+        loaded = Decisions(self.work_dir, ['yatat.keep', 'yatat.destroy'])
+        self.assertEqual(0, loaded.count('yatat.destroy'))
+        stopped = threading.Event()
+        with patch('yatat.Server.commit_interval', 0.01):
+            committer = threading.Thread(target=self.server.autocommit, args=(stopped,))
+            committer.start()
+            sleep(0.1)
+            stopped.set()
+            committer.join()
+        loaded = Decisions(self.work_dir, ['yatat.keep', 'yatat.destroy'])
+        self.assertEqual(['11111'], list(loaded.decision('yatat.destroy')[1]))
+        with patch.object(self.decisions, 'commit') as commit:
+            self.server.commit()
+            commit.assert_not_called()
+
+    def test_concurrent_decision(self):
+        """Responses computed while a decision lands aren't cached"""
+        route, racing = self.server.route, [True]
+
+        def racing_route(method, path, query):
+            response = route(method, path, query)
+            if racing.pop() if racing else False:
+                self.server.respond('POST', '/tweets/11111/destroy')
+            return response
+
+        with patch.object(self.server, 'route', side_effect=racing_route):
+            self.assertEqual('undecided', self.request('GET', '/tweets/11111')[1]['state'])
+        self.assertEqual(0, len(self.server.cache))
+        self.assertEqual('destroy', self.request('GET', '/tweets/11111')[1]['state'])
+
+    def test_sessions(self):
+        """Serving a session picks up the decisions of others"""
+        self.server.decisions = Decisions(
+            self.work_dir, ['yatat.keep', 'yatat.destroy'], session='server'
+        )
+        self.server.export = Export(self.server.decisions, (('yatat.keep', 'keep'),))
+        self.server.merge_interval = 0
+        self.assertEqual('undecided', self.request('GET', '/tweets/11111')[1]['state'])
+        Decisions(self.work_dir, ['yatat.keep'], session='bob').decide('11111', 'yatat.keep')
+        self.assertEqual('keep', self.request('GET', '/tweets/11111')[1]['state'])
+
+    def test_bad_address(self):
+        """Fail without port"""
+        self.assertRaises(Oops, self.server.serve, 'localhost')
+
+
+class ExportTest(ArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archive = Archive(self.work_dir)
+        self.decisions = Decisions(self.work_dir, ['yatat.keep', 'yatat.destroy'])
+        self.decisions.decide('11111', 'yatat.keep')
+        self.decisions.decide('22222', 'yatat.destroy')
+        self.export = Export(self.decisions, (('yatat.keep', 'keep'), ('yatat.destroy', 'destroy')))
+        self.path = '{}/yatat.test-export'.format(self.work_dir)
+
+    def test_jsonl(self):
+        """Export JSON lines"""
+        self.assertEqual(6, self.export.write(self.archive.tweets, self.path))
+        with open(self.path) as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(['keep', 'destroy', 'undecided'], [row['state'] for row in rows[:3]])
+        self.assertEqual('retweet', rows[2]['kind'])
+        self.assertEqual('reply', rows[3]['kind'])
+        self.assertEqual('11111', rows[3]['in_reply_to_status_id'])
+
+    def test_csv(self):
+        """Export CSV"""
+        self.assertEqual(6, self.export.write(self.archive.tweets, self.path, 'csv'))
+        with open(self.path, newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(6, len(rows))
+        self.assertEqual('Foo, Bar & Baz.', rows[1]['text'])
+        self.assertEqual('destroy', rows[1]['state'])
+        self.assertRaises(Oops, self.export.write, [], self.path, 'xml')
+
+
+class SessionsTest(ArchiveTestCase):
+
+    decisions = ['yatat.keep', 'yatat.destroy']
+
+    def test_merge(self):
+        """Sessions see each other's decisions, last one wins"""
+        alice = Decisions(self.work_dir, self.decisions, session='alice')
+        bob = Decisions(self.work_dir, self.decisions, session='bob')
+        alice.decide(1, 'yatat.keep')
+        alice.decide(2, 'yatat.keep')
+        bob.decide_all([2, 3], 'yatat.destroy')
+        bob.revoke(3, 'yatat.destroy')
+        bob.revoke(4, 'yatat.destroy')
+        alice.merge()
+        bob.merge()
+        for decisions in (alice, bob, Decisions(self.work_dir, self.decisions, session='carol')):
+            self.assertEqual(['1'], list(decisions.decision('yatat.keep')[1]))
+            self.assertEqual(['2'], list(decisions.decision('yatat.destroy')[1]))
+            self.assertEqual(
+                {'2': {'alice': 'yatat.keep', 'bob': 'yatat.destroy'}}, decisions.conflicts()
+            )
+        with open(alice.log_file('bob')) as file:
+            self.assertEqual(3, len(file.readlines()))
+
+    def test_folded_logs(self):
+        """Committed log entries don't override later decisions"""
+        alice = Decisions(self.work_dir, self.decisions, session='alice')
+        alice.decide('1', 'yatat.destroy')
+        alice.commit()
+        plain = Decisions(self.work_dir, self.decisions)
+        self.assertEqual(['1'], list(plain.decision('yatat.destroy')[1]))
+        plain.revoke('1', 'yatat.destroy')
+        plain.decide('1', 'yatat.keep')
+        plain.commit()
+        bob = Decisions(self.work_dir, self.decisions, session='bob')
+        self.assertEqual(['1'], list(bob.decision('yatat.keep')[1]))
+        self.assertEqual([], list(bob.decision('yatat.destroy')[1]))
+        alice.decide('2', 'yatat.destroy')
+        self.assertEqual(['2'], list(Decisions(
+            self.work_dir, self.decisions).decision('yatat.destroy')[1]))
+
+    def test_commit_lock(self):
+        """Commits of sessions don't interleave"""
+        alice = Decisions(self.work_dir, self.decisions, session='alice')
+        bob = Decisions(self.work_dir, self.decisions, session='bob')
+        bob.decide('1', 'yatat.keep')
+        with alice.locked():
+            committer = threading.Thread(target=bob.commit)
+            committer.start()
+            committer.join(0.2)
+            self.assertTrue(committer.is_alive())
+            self.assertFalse(os.path.exists(bob.offsets_file()))
+        committer.join()
+        self.assertTrue(os.path.exists(bob.offsets_file()))
+
+    def test_partial_lines(self):
+        """Lines still being written are merged later"""
+        with open('{}/yatat.session.bob.log'.format(self.work_dir), 'w') as file:
+            file.write('1\tdecide\tyatat.keep\t7\n2\tdecide\tyatat.unknown\t8\n3\tdecide')
+        alice = Decisions(self.work_dir, self.decisions, session='alice')
+        self.assertEqual(['7'], list(alice.decision('yatat.keep')[1]))
+        with open('{}/yatat.session.bob.log'.format(self.work_dir), 'a') as file:
+            file.write('\tyatat.destroy\t7\n')
+        alice.merge()
+        self.assertEqual(0, alice.count('yatat.keep'))
+        self.assertEqual(1, alice.count('yatat.destroy'))
+        self.assertRaises(Oops, Decisions, self.work_dir, self.decisions, session='a/b')
+
+    def test_invalid_session(self):
+        """Invalid session names are refused before any file is touched"""
+        with open('{}/yatat.keep'.format(self.work_dir), 'w') as file:
+            file.write('5\n')
+        self.assertRaises(Oops, Decisions, self.work_dir, self.decisions, session='a/b')
+        self.assertFalse(os.path.exists('{}/yatat.keep.ids'.format(self.work_dir)))
+        self.assertEqual(['5'], list(Decisions(self.work_dir, self.decisions).decision('yatat.keep')[1]))
+
+
+class IdSetTest(ArchiveTestCase):
+
+    def test_set_operations(self):
+        """Add, discard and check IDs"""
+        ids = IdSet()
+        ids.update([3, '1', 2, 2])
+        self.assertEqual(3, len(ids))
+        self.assertTrue('1' in ids and 3 in ids)
+        self.assertFalse('not a number' in ids)
+        ids.discard(2)
+        ids.discard(7)
+        self.assertEqual(['1', '3'], list(ids))
+        self.assertRaises(ValueError, ids.add, 'not a number')
+
+    def test_save_and_load(self):
+        """Persist IDs as memory-mapped binary file"""
+        filename = '{}/yatat.test.ids'.format(self.work_dir)
+        ids = IdSet()
+        ids.update([1234567890123456789, 5, 3])
+        ids.save(filename)
+        self.assertFalse(ids.dirty)
+        self.assertEqual(24, os.path.getsize(filename))
+        loaded = IdSet.load(filename)
+        self.assertEqual(['3', '5', '1234567890123456789'], list(loaded))
+        loaded.discard('5')
+        loaded.add(4)
+        loaded.add(5)
+        self.assertTrue(loaded.dirty)
+        self.assertEqual(['3', '4', '5', '1234567890123456789'], list(loaded))
+        loaded.save(filename)
+        self.assertEqual(4, len(IdSet.load(filename)))
+
+
+class TelemetryTest(ArchiveTestCase):
+
+    class RateLimitError(Exception):
+        api_code = 88
+
+    def test_run(self):
+        """Record latencies, errors and progress"""
+        path = '{}/yatat.telemetry.jsonl'.format(self.work_dir)
+        telemetry = Telemetry(path, 5, run='test')
+        for latency in (0.4, 0.1, 0.3, 0.2):
+            telemetry.record(1, latency)
+        telemetry.record(2, 1.0, self.RateLimitError())
+        telemetry.record(3, 0.5, ValueError())
+        summary = telemetry.summary()
+        self.assertEqual(4, summary['succeeded'])
+        self.assertEqual(0.3, summary['p50'])
+        self.assertEqual(1.0, summary['p95'])
+        self.assertEqual({'RateLimitError:88': 1, 'ValueError': 1}, summary['errors'])
+        self.assertEqual(0, summary['remaining'])
+        self.assertTrue('RateLimitError:88=1, ValueError=1' in str(telemetry))
+        telemetry.finish()
+        with open(path) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(7, len(records))
+        self.assertEqual('ValueError', records[5]['error'])
+        self.assertEqual(4, records[6]['succeeded'])
+
+    def test_empty(self):
+        """Nothing recorded yet"""
+        telemetry = Telemetry('/dev/null', 3)
+        self.assertEqual(0.0, telemetry.percentile(99))
+        self.assertTrue('remaining: 3, ETA: ?' in str(telemetry))
+
+
+class BulkExecutorTest(ArchiveTestCase):
+
+    def test_run(self):
+        """Call in parallel, report successes"""
+        calls, done = [], []
+
+        def call(subject):
+            calls.append(subject)
+            if subject % 3 == 0:
+                raise ValueError(subject)
+
+        telemetry = Telemetry('{}/yatat.telemetry.jsonl'.format(self.work_dir), 10)
+        executor = BulkExecutor(call, rate=1000, workers=3, telemetry=telemetry)
+        self.assertEqual((7, 3), executor.run(range(1, 11), done.append))
+        self.assertEqual(list(range(1, 11)), sorted(calls))
+        self.assertEqual([1, 2, 4, 5, 7, 8, 10], sorted(done))
+        self.assertEqual({'ValueError': 3}, telemetry.summary()['errors'])
+
+    def test_rate_limit(self):
+        """Space calls evenly"""
+        started = perf_counter()
+        BulkExecutor(lambda subject: None, rate=50, workers=4).run(range(6), lambda subject: None)
+        self.assertTrue(perf_counter() - started >= 0.09)
+
+
+class DaemonTest(ArchiveTestCase):
+
+    decisions = ['yatat.keep', 'yatat.destroy', 'yatat.destroyed']
+
+    def setUp(self):
+        super().setUp()
+        self.reviewer = Decisions(
+            self.work_dir, self.decisions, session='reviewer', reviewed=self.decisions[:2]
+        )
+        self.reviewer.decide_all(['1', '2', '3'], 'yatat.destroy')
+        self.api = FakeAPI()
+        self.daemon = Daemon(
+            Decisions(self.work_dir, self.decisions, session='daemon'),
+            self.api.destroy_status, 'yatat.destroy', 'yatat.destroyed',
+            skip=('yatat.keep',), quota=2, window=60
+        )
+
+    def test_quota(self):
+        """Drain the queue within quota, pick up new decisions"""
+        self.reviewer.decide('2', 'yatat.keep')
+        with managed_io():
+            self.assertEqual(0, self.daemon.step())
+            self.assertEqual(0, self.daemon.step())
+            self.reviewer.decide('4', 'yatat.destroy')
+            self.assertTrue(59 < self.daemon.step() <= 60)
+        self.assertEqual(['1', '3'], self.api.destroyed)
+        status = self.daemon.status()
+        self.assertEqual('waiting', status['state'])
+        self.assertEqual(1, status['queued'])
+        self.assertEqual(2, status['done'])
+        self.reviewer.merge()
+        self.assertEqual({}, self.reviewer.conflicts())
+        self.assertEqual(['1', '3'], list(self.reviewer.decision('yatat.destroyed')[1]))
+        self.assertEqual(['4'], list(self.reviewer.decision('yatat.destroy')[1]))
+
+    def test_quota_after_restart(self):
+        """Calls recorded by former runs count against the quota"""
+        path = '{}/yatat.telemetry.jsonl'.format(self.work_dir)
+        telemetry = Telemetry(path, 0, 'daemon')
+        telemetry.record('7', 0.1)
+        telemetry.finish()
+        with open(path, 'a') as file:
+            file.write(json.dumps({'run': 'old', 'time': 1.0, 'subject': '8'}) + '\n')
+        daemon = Daemon(
+            Decisions(self.work_dir, self.decisions, session='daemon'),
+            self.api.destroy_status, 'yatat.destroy', 'yatat.destroyed',
+            quota=2, window=60, telemetry=Telemetry(path, 0, 'daemon')
+        )
+        self.assertEqual(1, len(daemon.calls))
+        with managed_io():
+            self.assertEqual(0, daemon.step())
+            self.assertTrue(59 < daemon.step() <= 60)
+        self.assertEqual(['1'], self.api.destroyed)
+
+    def test_control(self):
+        """Pause, resume and stop"""
+        self.assertEqual('paused', self.daemon.control('pause')['state'])
+        self.assertEqual(self.daemon.poll, self.daemon.step())
+        self.assertEqual([], self.api.destroyed)
+        self.daemon.control('resume')
+        with managed_io():
+            self.assertEqual(0, self.daemon.step())
+        self.assertEqual('running', self.daemon.control('status')['state'])
+        self.assertTrue('error' in self.daemon.control('explode'))
+        self.assertEqual('stopped', self.daemon.control('stop')['state'])
+        with managed_io():
+            self.daemon.run()
+        self.assertEqual(['1'], self.api.destroyed)
+
+    def test_failures(self):
+        """Leave out subjects that keep failing"""
+        self.daemon.call = mock.Mock(side_effect=ValueError('gone'))
+        self.daemon.quota = 100
+        with managed_io():
+            for _ in range(9):
+                self.daemon.step()
+        self.assertEqual(self.daemon.poll, self.daemon.step())
+        status = self.daemon.status()
+        self.assertEqual(['1', '2', '3'], status['failed'])
+        self.assertEqual(0, status['queued'])
+
+    def test_terminate(self):
+        """SIGTERM stops without taking the lock"""
+        with self.daemon.lock:
+            self.daemon.terminate(15, None)
+        self.assertTrue(self.daemon.stopped)
+        self.assertTrue(self.daemon.wakeup.is_set())
+
+    def test_socket(self):
+        """Control the daemon through its socket"""
+        socket_path = '{}/yatat.sock'.format(self.work_dir)
+        self.daemon.quota = 0
+        thread = threading.Thread(target=self.daemon.run, args=(socket_path,))
+        with managed_io():
+            thread.start()
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                thread.join(0.01)
+            self.assertEqual(3, Daemon.send(socket_path, 'status')['queued'])
+            with self.assertRaises(Oops):
+                self.daemon.listen(socket_path)
+            self.assertEqual('stopped', Daemon.send(socket_path, 'stop')['state'])
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(socket_path))
+
+
+class BackendTest(TestCase):
+
+    def test_lazy_import(self):
+        """Offline startup does not import the online API client"""
+        output = subprocess.check_output([
+            sys.executable, '-c', 'import sys, yatat; print("tweepy" in sys.modules)'
+        ], cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(b'False', output.strip())
+
+    def test_backends(self):
+        """Find and plug backends"""
+        self.assertIs(FakeAPI, backend('fake'))
+        self.assertIs(FakeAPI, backend('yatat:FakeAPI'))
+        self.assertRaises(Oops, backend, 'no.such.module:factory')
+        self.assertRaises(Oops, backend, True)
+        api = FakeAPI()
+        api.destroy_status(1)
+        self.assertEqual('fake', api.me().screen_name)
+        self.assertEqual(['1'], api.destroyed)
+
 
 def fake_clear_screen():
     print('\n\t[ -- FAKE CLEAR SCREEN -- ]\n')
@@ -221,6 +1127,16 @@ class UserInterfaceTest(ArchiveTestCase):
         console = str(out.getvalue().strip())
         self.assertTrue('Usage:' in console)
 
+    def test_export(self):
+        """Export headless without user interaction"""
+        path = '{}/yatat.test-export.csv'.format(self.work_dir)
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir, '--export=' + path, '--exclude=retweets'])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('Exported 4 tweets' in console)
+        self.assertTrue(os.path.exists(path))
+
     @patch('builtins.input', mock.Mock(side_effect=['test_username', 'Q']))
     def test_username(self):
         """Start app, enter username, quit"""
@@ -278,6 +1194,41 @@ class UserInterfaceTest(ArchiveTestCase):
         self.assertTrue('Filter out tweets?' in console)
         self.assertTrue('Still 6 tweets' in console)
 
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username',
+        'A','N','N','N','N','ENTER','C','C','Q',
+        'A','N','N','N','N','ENTER','Q',
+        'A','N','N','N','N','R','Q',
+        'Q'
+    ]))
+    def test_resume(self):
+        """Resume reading where we stopped"""
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('resuming where you stopped (R to restart)' in console)
+        pages = console.split('Continue without decision')
+        self.assertTrue('33333' in pages[2] and '33333' in pages[3])
+        self.assertTrue('11111' in pages[4])
+        with open('{}/yatat.cursors'.format(self.work_dir)) as file:
+            self.assertEqual([[0, '11111']], list(json.load(file).values()))
+
+    def test_shared_cursors(self):
+        """Sessions only write the reading positions they changed"""
+        alice, bob = Cursors(self.work_dir), Cursors(self.work_dir)
+        alice.set('all', 2, '33333')
+        alice.set('foo', 1, '22222')
+        alice.save()
+        bob.set('bar', 3, '44444')
+        bob.clear('foo')
+        bob.save()
+        archive = Archive(self.work_dir)
+        carol = Cursors(self.work_dir)
+        self.assertEqual(2, carol.get('all', archive))
+        self.assertEqual(3, carol.get('bar', archive))
+        self.assertEqual(0, carol.get('foo', archive))
+
     @patch('builtins.input', mock.Mock(side_effect=[
         'test_username',
         'A','N','N','N','N','ENTER',KeyboardInterrupt(),'Q'
@@ -397,6 +1348,44 @@ class UserInterfaceTest(ArchiveTestCase):
         self.assertTrue(console.endswith('Cheers!'))
         self.assertTrue('Having 2 tweets' in console)
 
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username', 'D', 'ENTER', 'X', 'Q'
+    ]))
+    def test_duplicates(self):
+        """Review near-duplicates, decide in bulk"""
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('1 clusters of 2 similar tweets' in console)
+        self.assertTrue('-> and 1 similar tweets' in console)
+        self.assertTrue('to destroy .: 2' in console)
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username', 'A','N','N','N','N','ENTER', 'X', 'Q', 'Q'
+    ]))
+    def test_session(self):
+        """Report conflicts with other sessions"""
+        with open('{}/yatat.session.bob.log'.format(self.work_dir), 'w') as file:
+            file.write('1\tdecide\tyatat.keep\t11111\n')
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir, '--session=alice'])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('11111 alice: yatat.destroy, bob: yatat.keep' in console)
+        self.assertTrue(os.path.exists('{}/yatat.session.alice.log'.format(self.work_dir)))
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username', 'I', 'ENTER', 'Q'
+    ]))
+    def test_statistics(self):
+        """Show statistics"""
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('Top hashtags:' in console)
+
     @patch('builtins.input', mock.Mock(side_effect=[
         'test_username',
         'T','','N','N','N','N','ENTER',
@@ -423,6 +1412,20 @@ class UserInterfaceTest(ArchiveTestCase):
         self.assertTrue(console.endswith('Cheers!'))
         self.assertTrue('1 tweets to read' in console)
 
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username',
+        'T','2020-09','N','N','N','N','ENTER',
+        'Q','Q'
+    ]))
+    def test_budget(self):
+        """Read tweets from disk"""
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir, '--budget=1'])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('5 tweets to read' in console)
+        self.assertTrue(os.path.exists('{}/yatat.table'.format(self.work_dir)))
+
     @patch('builtins.input', mock.Mock(side_effect=[
         'test_username',
         'T','2020-09','N','N','N','N','ENTER',
@@ -455,12 +1458,92 @@ class UserInterfaceTest(ArchiveTestCase):
         self.assertTrue('2020-09-18 33333' in console)
         self.assertTrue('to destroy .: 0' in console)
         self.assertTrue('destroyed ..: 2' in console)
+        self.assertTrue('/min, latency p50' in console)
+        self.assertTrue(os.path.exists('{}/yatat.telemetry.jsonl'.format(self.work_dir)))
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'A','N','N','N','N','ENTER',
+        'X','Q',
+        'X','ENTER','Q'
+    ]))
+    def test_destroy_fake_backend(self):
+        """Destroy tweets with the fake backend"""
+        with managed_io() as (out):
+            UserInterface(['', self.work_dir, '--backend=fake'])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('Authenticated as: fake' in console)
+        self.assertTrue('1 tweets marked to DESTROY' in console)
+        self.assertTrue('destroyed ..: 1' in console)
+
+    def test_daemon(self):
+        """Run the daemon headless, talk to it"""
+        with patch('yatat.Daemon.run') as run, managed_io() as (out):
+            UserInterface(['', self.work_dir, '--daemon', '--backend=fake', '--quota=10'])
+        run.assert_called_once_with('{}/yatat.sock'.format(self.work_dir))
+        console = out.getvalue()
+        self.assertTrue('Daemon session "daemon" draining yatat.destroy, '
+                        'at most 10 calls per 900.0s' in console)
+        self.assertRaises(Oops, UserInterface, ['', self.work_dir, '--control=status'])
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'L', 'Y', 'ENTER', 'ENTER',
+        'L', 'N', 'ENTER', 'ENTER',
+        'A','N','N','N','N','ENTER', 'C', 'C', '', 'Q',
+        'R', 'Y', 'ENTER', 'ENTER',
+        'Q'
+    ]))
+    def test_unlike_and_unretweet(self):
+        """Unlike and undo retweets in bulk"""
+        self.write_likes()
+        with managed_io() as (out):
+            ui = UserInterface(['', self.work_dir, '--backend=fake', '--rate=1000'])
+        console = str(out.getvalue().strip())
+        self.assertTrue(console.endswith('Cheers!'))
+        self.assertTrue('2 likes not marked yet' in console)
+        self.assertTrue('0 likes not marked yet' in console)
+        self.assertTrue('1 retweets not marked yet' in console)
+        self.assertTrue('2 succeeded, 0 failed.' in console)
+        self.assertTrue('1 succeeded, 0 failed.' in console)
+        self.assertEqual(['77777', '88888', '55555'], ui.api.destroyed)
+        self.assertEqual(2, ui.reactions.count(ui.unliked))
+        self.assertEqual(0, ui.reactions.count(ui.unlike))
+        self.assertEqual(1, ui.reactions.count(ui.unretweeted))
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username', 'L', 'Y', 'ENTER', 'Q'
+    ]))
+    def test_unlike_offline(self):
+        """Mark likes offline"""
+        self.write_likes()
+        with managed_io() as (out):
+            ui = UserInterface(['', self.work_dir])
+        console = str(out.getvalue().strip())
+        self.assertTrue('2 likes marked, API not connected' in console)
+        self.assertEqual(2, ui.reactions.count(ui.unlike))
+
+    @patch('builtins.input', mock.Mock(side_effect=[
+        'test_username', 'R', 'Y', 'ENTER',
+        'A', 'Y', 'N', 'N', 'N', 'ENTER', 'Q', 'Q'
+    ]))
+    def test_marked_retweets_unread(self):
+        """Marked retweets are still unread, decided retweets aren't marked"""
+        decisions = Decisions(self.work_dir, [UserInterface.destroy])
+        decisions.decide('33333', UserInterface.destroy)
+        decisions.commit()
+        with managed_io() as (out):
+            ui = UserInterface(['', self.work_dir, '--session=alice'])
+        console = str(out.getvalue().strip())
+        self.assertTrue('1 retweets not marked yet' in console)
+        self.assertTrue('Still 5 tweets' in console)
+        self.assertEqual(['55555'], list(ui.reactions.decision(ui.unretweet)[1]))
+        self.assertEqual(['33333'], list(ui.decisions.decision(ui.destroy)[1]))
 
     @patch('builtins.input', mock.Mock(side_effect=[
         'test_username',
         'A','N','N','N','N','ENTER',
         'C','X','X','','Q',
-        'A','N','N','N','N','ENTER',
+        'A','N','N','N','N','R',
         'C','','X','','Q',
         'X','ENTER','Q'
     ]))
@@ -471,7 +1554,7 @@ class UserInterfaceTest(ArchiveTestCase):
             UserInterface(['', self.work_dir])
         console = str(out.getvalue().strip())
         self.assertTrue(console.endswith('Cheers!'))
-        self.assertTrue('2 tweets marked to DESTROY' in console)
+        self.assertTrue('1 tweets marked to DESTROY' in console)
         self.assertTrue('DESTROYING' in console)
         self.assertFalse('2020-09-18 22222' in console)
         self.assertTrue('2020-09-18 33333' in console)